@@ -0,0 +1,188 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# Responses that mean "slow down"
+THROTTLE_STATUSES = {429, 503}
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit for fetchers and the renderer. The number of
+    requests allowed in flight grows by about one per round of successful
+    requests while latency stays healthy, and is cut multiplicatively on HTTP
+    429 / 503, errors, or when the p95 latency of recent requests passes
+    `latency_target`. A Retry-After header pauses new requests until it has
+    passed. The current limit is exposed through `limit` and `metrics()`.
+
+    Use `slot()` from threads or `async_slot()` from asyncio tasks (one kind
+    per limiter), and report each finished request with `record()`.
+    """
+
+    def __init__(self, initial=4, min_limit=1, max_limit=32, decrease=0.5, latency_target=None,
+                 window=50, cooldown=2.0, name="limiter"):
+        """
+        Args:
+            initial (int): Starting limit.
+            min_limit (int): The limit never drops below this.
+            max_limit (int): The limit never grows past this.
+            decrease (float): Factor applied to the limit on a back-off.
+            latency_target (float): p95 latency in seconds above which the limit is
+                cut. None only reacts to status codes and errors.
+            window (int): Number of recent latencies the p95 is taken over.
+            cooldown (float): Minimum seconds between two cuts, so one burst of
+                429s counts as a single congestion signal.
+            name (str): Label used in metrics output.
+        """
+        self._limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+        self.name = name
+        self.in_flight = 0
+        self.throttled = 0
+        self.errors = 0
+        self.completed = 0
+        self._latencies = deque(maxlen=window)
+        self._last_decrease = 0.0
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+        self._async_cond = None
+
+    @property
+    def limit(self):
+        return max(self.min_limit, int(self._limit))
+
+    def p95(self):
+        if not self._latencies:
+            return 0.0
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def _back_off(self, now):
+        if now - self._last_decrease >= self.cooldown:
+            self._limit = max(self.min_limit, self._limit * self.decrease)
+            self._last_decrease = now
+
+    def record(self, latency, status=None, retry_after=None, error=False):
+        """
+        Feeds one finished request into the controller.
+
+        Args:
+            latency (float): Seconds the request took.
+            status (int): HTTP status, if there was a response.
+            retry_after (str | float): Retry-After header value, if any.
+            error (bool): The request failed without a usable response.
+        """
+        now = time.monotonic()
+        self.completed += 1
+        self._latencies.append(latency)
+        if status in THROTTLE_STATUSES or error:
+            if status in THROTTLE_STATUSES:
+                self.throttled += 1
+            else:
+                self.errors += 1
+            self._back_off(now)
+            wait = parse_retry_after(retry_after) if isinstance(retry_after, str) else retry_after
+            if wait:
+                self._paused_until = max(self._paused_until, now + wait)
+        elif self.latency_target and len(self._latencies) >= 10 and self.p95() > self.latency_target:
+            self._back_off(now)
+        else:
+            # Additive increase: +1 after about `limit` successful requests
+            self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+        self._notify()
+
+    def record_response(self, response, latency):
+        """Shortcut for a `requests` response."""
+        self.record(latency, response.status_code, response.headers.get('Retry-After'))
+
+    def _notify(self):
+        with self._cond:
+            self._cond.notify_all()
+        if self._async_cond is not None:
+            asyncio.ensure_future(self._notify_async())
+
+    async def _notify_async(self):
+        async with self._async_cond:
+            self._async_cond.notify_all()
+
+    def _wait_time(self):
+        """0 if a request may start now, else seconds until the next check."""
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            return pause
+        if self.in_flight >= self.limit:
+            return 1.0
+        return 0
+
+    @contextmanager
+    def slot(self):
+        """Blocks the calling thread until a request may start."""
+        with self._cond:
+            while True:
+                wait = self._wait_time()
+                if not wait:
+                    break
+                self._cond.wait(wait)
+            self.in_flight += 1
+        try:
+            yield self
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    @asynccontextmanager
+    async def async_slot(self):
+        """Waits, without blocking the event loop, until a request may start."""
+        if self._async_cond is None:
+            self._async_cond = asyncio.Condition()
+        async with self._async_cond:
+            while True:
+                wait = self._wait_time()
+                if not wait:
+                    break
+                try:
+                    await asyncio.wait_for(self._async_cond.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+            self.in_flight += 1
+        try:
+            yield self
+        finally:
+            async with self._async_cond:
+                self.in_flight -= 1
+                self._async_cond.notify_all()
+
+    def metrics(self):
+        return {
+            'name': self.name,
+            'limit': self.limit,
+            'in_flight': self.in_flight,
+            'p95_latency': round(self.p95(), 3),
+            'completed': self.completed,
+            'throttled': self.throttled,
+            'errors': self.errors,
+            'paused_for': round(max(0.0, self._paused_until - time.monotonic()), 1),
+        }
@@ -0,0 +1,310 @@
+import asyncio
+import time
+import weakref
+from collections import deque
+from pyppeteer import launch
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+# Seconds the job running on a tab spent waiting rather than using its browser
+_excluded_seconds = weakref.WeakKeyDictionary()
+
+
+def browser_alive(page):
+    """False once the browser behind `page` has crashed or disconnected."""
+    connection = getattr(page.browser, '_connection', None)
+    return getattr(connection, '_connected', True)
+
+
+def exclude_from_latency(page, seconds):
+    """
+    Leaves `seconds` out of the latency the watchdog records for the job
+    running on `page`. Jobs call this for time spent waiting on limiters or
+    backing off, which says nothing about the health of the browser.
+    """
+    if page in _excluded_seconds:
+        _excluded_seconds[page] += seconds
+
+
+class BrowserSlot:
+    """One Chromium process of the pool, with the counters the watchdog reads."""
+
+    def __init__(self, browser, generation):
+        self.browser = browser
+        self.generation = generation
+        self.pages_rendered = 0
+        self.in_flight = 0
+        self.latencies = deque(maxlen=20)
+        self.draining = False
+        self.crashed = False
+        self.retired = False
+        browser.on('disconnected', self._on_disconnected)
+
+    def _on_disconnected(self):
+        if not self.retired:
+            self.crashed = True
+
+    def rss_bytes(self):
+        """
+        Resident memory of the browser process and all of its renderer /
+        GPU children, or None when psutil is not installed.
+        """
+        if psutil is None or self.browser.process is None:
+            return None
+        try:
+            root = psutil.Process(self.browser.process.pid)
+            return sum(p.memory_info().rss for p in [root] + root.children(recursive=True))
+        except psutil.Error:
+            return None
+
+    def mean_latency(self):
+        if not self.latencies:
+            return 0
+        return sum(self.latencies) / len(self.latencies)
+
+
+class BrowserPool:
+    """
+    Keeps a fixed number of Chromium processes alive for the whole run, each
+    serving several reusable tabs. Jobs are fed through an asyncio semaphore so
+    that at most `num_browsers * tabs_per_browser` renders are in flight.
+
+    A watchdog recycles a browser after `max_pages_per_browser` pages, or once
+    its memory or mean job latency crosses a threshold: the browser stops
+    taking new jobs, its in-flight jobs finish, and a fresh process replaces
+    it. Jobs that die with their browser are re-queued on another tab.
+    """
+
+    def __init__(self, chrome_path, user_agent, num_browsers=2, tabs_per_browser=4, tab_setup=None,
+                 max_pages_per_browser=500, max_rss_mb=None, max_latency=None, max_requeues=2):
+        """
+        Args:
+            chrome_path (str): Path to the Chromium / Chrome executable.
+            user_agent (str): User agent set on every tab.
+            num_browsers (int): Number of Chromium processes to launch.
+            tabs_per_browser (int): Number of tabs kept open in each process.
+            tab_setup (coroutine function): Optional `tab_setup(page)` run once on every
+                new tab, e.g. to install request interception.
+            max_pages_per_browser (int): Recycle a browser after this many jobs (None to disable).
+            max_rss_mb (int): Recycle a browser whose processes use more memory than this
+                (needs psutil, None to disable).
+            max_latency (float): Recycle a browser whose recent jobs take longer than this
+                many seconds on average (None to disable). Time a job reports
+                with exclude_from_latency() is not counted.
+            max_requeues (int): How many times a job is retried after its browser crashed.
+        """
+        self.chrome_path = chrome_path
+        self.user_agent = user_agent
+        self.num_browsers = num_browsers
+        self.tabs_per_browser = tabs_per_browser
+        self.tab_setup = tab_setup
+        self.max_pages_per_browser = max_pages_per_browser
+        self.max_rss_mb = max_rss_mb
+        self.max_latency = max_latency
+        self.max_requeues = max_requeues
+        self.slots = []
+        self.recycled = 0
+        self.requeued = 0
+        self._generation = 0
+        self._tabs = None
+        self._semaphore = None
+        self._tasks = set()
+
+    @property
+    def capacity(self):
+        return self.num_browsers * self.tabs_per_browser
+
+    async def start(self):
+        """Launches the browsers and opens all of their tabs."""
+        self._tabs = asyncio.Queue()
+        self._semaphore = asyncio.Semaphore(self.capacity)
+        for _ in range(self.num_browsers):
+            await self._launch_slot()
+        if self.max_rss_mb and psutil is None:
+            print("psutil is not installed, browser memory limit is ignored")
+        print(f"Browser pool started: {self.num_browsers} browsers x {self.tabs_per_browser} tabs")
+        return self
+
+    async def close(self):
+        """Waits for in-flight jobs and shuts every browser down."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        for slot in self.slots:
+            await self._close_slot(slot)
+        self.slots = []
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _launch_slot(self):
+        self._generation += 1
+        browser = await launch(headless=True, executablePath=self.chrome_path)
+        slot = BrowserSlot(browser, self._generation)
+        self.slots.append(slot)
+        for _ in range(self.tabs_per_browser):
+            self._tabs.put_nowait((slot, await self._new_tab(browser)))
+        return slot
+
+    async def _close_slot(self, slot):
+        slot.retired = True
+        try:
+            await slot.browser.close()
+        except Exception as e:
+            print(f"Error closing browser: {e}")
+
+    async def _recycle(self, slot):
+        """Replaces a drained (or crashed) browser with a fresh process."""
+        if slot.retired:
+            return
+        print(f"Recycling browser {slot.generation} after {slot.pages_rendered} pages")
+        await self._close_slot(slot)
+        self.slots.remove(slot)
+        self.recycled += 1
+        await self._launch_slot()
+
+    async def _new_tab(self, browser):
+        page = await browser.newPage()
+        await page.setUserAgent(self.user_agent)
+        if self.tab_setup is not None:
+            await self.tab_setup(page)
+        return page
+
+    async def _reset_tab(self, page):
+        """
+        Clears a tab between articles so the next job starts from a blank
+        document. A tab that cannot be reset is replaced by a fresh one on the
+        same browser.
+        """
+        try:
+            await page.goto('about:blank')
+            return page
+        except Exception as e:
+            print(f"Tab reset failed ({e}), opening a new tab")
+            browser = page.browser
+            try:
+                await page.close()
+            except Exception:
+                pass
+            return await self._new_tab(browser)
+
+    def _check_watchdog(self, slot):
+        """Marks a browser for recycling once it crosses any configured limit."""
+        if slot.draining:
+            return
+        reason = None
+        if self.max_pages_per_browser and slot.pages_rendered >= self.max_pages_per_browser:
+            reason = f"{slot.pages_rendered} pages"
+        elif self.max_latency and len(slot.latencies) == slot.latencies.maxlen \
+                and slot.mean_latency() > self.max_latency:
+            reason = f"mean latency {slot.mean_latency():.1f}s"
+        elif self.max_rss_mb:
+            rss = slot.rss_bytes()
+            if rss is not None and rss > self.max_rss_mb * 1024 * 1024:
+                reason = f"{rss // (1024 * 1024)} MB RSS"
+        if reason:
+            print(f"Browser {slot.generation} draining: {reason}")
+            slot.draining = True
+
+    async def _acquire_tab(self):
+        """Takes the next usable tab, skipping tabs of browsers being recycled."""
+        while True:
+            slot, page = await self._tabs.get()
+            if slot.retired:
+                continue
+            if slot.draining or slot.crashed:
+                if slot.in_flight == 0:
+                    await self._recycle(slot)
+                continue
+            slot.in_flight += 1
+            return slot, page
+
+    async def _release_tab(self, slot, page, elapsed):
+        slot.in_flight -= 1
+        slot.pages_rendered += 1
+        slot.latencies.append(elapsed)
+        self._check_watchdog(slot)
+        if slot.draining or slot.crashed:
+            if slot.in_flight == 0:
+                await self._recycle(slot)
+            return
+        self._tabs.put_nowait((slot, await self._reset_tab(page)))
+
+    async def submit(self, job_fn, *args, on_give_up=None):
+        """
+        Schedules `job_fn(page, *args)` on the next free tab. Waits on the
+        semaphore first, so submitting from a long loop never queues more jobs
+        than the pool can run. If the job's browser crashes under it, the job
+        is re-queued on another tab up to `max_requeues` times.
+
+        Args:
+            on_give_up (function): Optional `on_give_up(error, *args)` called when
+                the job raised and is not re-queued again, so the caller can
+                record the failure.
+
+        Returns:
+            asyncio.Task: The task running the job.
+        """
+        await self._semaphore.acquire()
+
+        async def run():
+            try:
+                for attempt in range(self.max_requeues + 1):
+                    slot, page = await self._acquire_tab()
+                    started = time.monotonic()
+                    _excluded_seconds[page] = 0
+                    try:
+                        return await job_fn(page, *args)
+                    except Exception as e:
+                        if not slot.crashed or attempt == self.max_requeues:
+                            print(f"Job failed for {args}: {e}")
+                            if on_give_up is not None:
+                                try:
+                                    on_give_up(e, *args)
+                                except Exception as callback_error:
+                                    print(f"Failure callback error for {args}: {callback_error}")
+                            return None
+                        print(f"Browser {slot.generation} crashed, re-queueing {args}")
+                        self.requeued += 1
+                    finally:
+                        elapsed = time.monotonic() - started - _excluded_seconds.pop(page, 0)
+                        await self._release_tab(slot, page, max(elapsed, 0))
+            finally:
+                self._semaphore.release()
+
+        task = asyncio.ensure_future(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def map(self, job_fn, jobs, delay=0, on_give_up=None):
+        """
+        Runs `job_fn(page, *job)` for every tuple in `jobs` across the pool.
+
+        Args:
+            job_fn (coroutine function): Called with a tab followed by the job arguments.
+            jobs (iterable): Iterable of argument tuples. Consumed lazily.
+            delay (float): Pause in seconds between dispatches, to stay polite.
+            on_give_up (function): Passed on to submit().
+        """
+        for job in jobs:
+            await self.submit(job_fn, *job, on_give_up=on_give_up)
+            if delay:
+                await asyncio.sleep(delay)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self):
+        return {
+            'browsers': len(self.slots),
+            'recycled': self.recycled,
+            'requeued': self.requeued,
+            'pages': {slot.generation: slot.pages_rendered for slot in self.slots},
+            'rss_mb': {slot.generation: (slot.rss_bytes() or 0) // (1024 * 1024) for slot in self.slots},
+        }
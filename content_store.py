@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+
+# Normalised article body: the parser output without edit links, comments
+# (the parser report changes on every parse) or whitespace differences
+CONTENT_HASH_JS = """
+() => {
+    const root = document.querySelector('#mw-content-text .mw-parser-output')
+        || document.querySelector('#content') || document.body;
+    const clone = root.cloneNode(true);
+    clone.querySelectorAll('.mw-editsection, link, meta, style, script').forEach(el => el.remove());
+    const walker = document.createTreeWalker(clone, NodeFilter.SHOW_COMMENT);
+    const comments = [];
+    while (walker.nextNode()) comments.push(walker.currentNode);
+    comments.forEach(c => c.remove());
+    return clone.innerHTML.replace(/\\s+/g, ' ').trim();
+}
+"""
+
+
+async def page_content_hash(page, salt=""):
+    """
+    SHA-256 of the normalised article loaded in `page`. `salt` folds in the
+    render settings (CSS template, variant count, ...) so a change to them
+    invalidates every stored render.
+    """
+    content = await page.evaluate(CONTENT_HASH_JS)
+    return hashlib.sha256((salt + "\0" + content).encode('utf-8')).hexdigest()
+
+
+class ContentStore:
+    """
+    Content-addressed record of finished renders. Each content hash maps to
+    the (lang, title) rendered for it and that render's outputs; every other
+    title whose article hashes the same (a redirect, or an unchanged article
+    in a later run) is recorded as an alias of it instead of being rendered
+    again.
+    """
+
+    def __init__(self, path="dumps_full/content_store.sqlite"):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=60)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS renders (
+                hash TEXT PRIMARY KEY,
+                lang TEXT NOT NULL,
+                title TEXT NOT NULL,
+                outputs TEXT NOT NULL,
+                updated REAL
+            )
+        """)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS aliases (
+                lang TEXT NOT NULL,
+                title TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                updated REAL,
+                PRIMARY KEY (lang, title)
+            )
+        """)
+        self.reused = 0
+        self.aliased = 0
+
+    def lookup(self, content_hash):
+        """(lang, title, outputs) of the render stored for a hash, or None."""
+        row = self.db.execute("SELECT lang, title, outputs FROM renders WHERE hash = ?", (content_hash,)).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], json.loads(row[2])
+
+    def put(self, content_hash, lang, title, outputs):
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO renders VALUES (?, ?, ?, ?, ?)",
+                (content_hash, lang, title, json.dumps(outputs, ensure_ascii=False), time.time())
+            )
+            self.db.execute(
+                "INSERT OR REPLACE INTO aliases VALUES (?, ?, ?, ?)", (lang, title, content_hash, time.time())
+            )
+
+    def add_alias(self, content_hash, lang, title):
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO aliases VALUES (?, ?, ?, ?)", (lang, title, content_hash, time.time())
+            )
+
+    def aliases_of(self, content_hash):
+        return self.db.execute("SELECT lang, title FROM aliases WHERE hash = ?", (content_hash,)).fetchall()
+
+    def stats(self):
+        return {
+            'renders': self.db.execute("SELECT COUNT(*) FROM renders").fetchone()[0],
+            'aliases': self.db.execute("SELECT COUNT(*) FROM aliases").fetchone()[0],
+            'reused_this_run': self.reused,
+            'aliased_this_run': self.aliased,
+        }
+
+    def close(self):
+        self.db.close()
+
+
+def link_file(source, target):
+    """Hard-links `target` to `source` (same bytes, no copy), copying where links are not possible."""
+    os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+    tmp_path = f"{target}.part"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, target)
+
+
+def renamed_path(path, old_title, new_title):
+    """`path` with its file name's `old_title` prefix (variant suffix kept) swapped for `new_title`."""
+    directory, name = os.path.split(path)
+    return os.path.join(directory, new_title + name[len(old_title):])
@@ -0,0 +1,227 @@
+import heapq
+import os
+import tempfile
+from run_manifest import RunManifest
+from work_queue import WorkQueue, jobs_from_dump
+
+# Lines held in memory at once when a file has to be sorted first
+SORT_CHUNK_LINES = 1000000
+
+DUMP_HEADER = b"page_title"
+
+
+def iter_lines(path, skip_header=True):
+    """Non-empty lines of a title dump or listing as bytes, without line endings."""
+    with open(path, 'rb') as f:
+        if skip_header:
+            first = f.readline().rstrip(b'\r\n')
+            if first and first != DUMP_HEADER:
+                # Not a dump header after all (e.g. a revision listing)
+                yield first
+        for line in f:
+            line = line.rstrip(b'\r\n')
+            if line:
+                yield line
+
+
+def is_sorted(path):
+    """True if a file's lines are in byte order, checked in one streaming pass."""
+    previous = None
+    for line in iter_lines(path):
+        if previous is not None and line < previous:
+            return False
+        previous = line
+    return True
+
+
+def sorted_lines(path, chunk_lines=SORT_CHUNK_LINES):
+    """
+    Streams a file's distinct lines in byte order. Files that are already
+    sorted (dumps normally are) are read straight through; otherwise they are
+    sorted externally, in runs of `chunk_lines` written to temp files and
+    merged, so memory stays bounded either way.
+    """
+    if is_sorted(path):
+        previous = None
+        for line in iter_lines(path):
+            if line != previous:
+                yield line
+            previous = line
+        return
+
+    print(f"{path} is not sorted, sorting it in chunks of {chunk_lines} lines")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        runs = []
+        chunk = []
+        for line in iter_lines(path):
+            chunk.append(line)
+            if len(chunk) >= chunk_lines:
+                runs.append(_write_run(sorted(chunk), tmp_dir, len(runs)))
+                chunk = []
+        if chunk:
+            runs.append(_write_run(sorted(chunk), tmp_dir, len(runs)))
+
+        files = [open(run, 'rb') for run in runs]
+        try:
+            previous = None
+            for line in heapq.merge(*((line.rstrip(b'\n') for line in f) for f in files)):
+                if line != previous:
+                    yield line
+                previous = line
+        finally:
+            for f in files:
+                f.close()
+
+
+def _write_run(lines, tmp_dir, n):
+    path = os.path.join(tmp_dir, f"run{n}")
+    with open(path, 'wb') as f:
+        for line in lines:
+            f.write(line + b'\n')
+    return path
+
+
+def diff_sorted(old, new):
+    """
+    Merges two sorted streams in one pass.
+
+    Yields:
+        tuple: ('added', item) for items only in `new`, ('removed', item) for
+        items only in `old`, ('common', item) for items in both.
+    """
+    sentinel = object()
+    old_item = next(old, sentinel)
+    new_item = next(new, sentinel)
+    while old_item is not sentinel or new_item is not sentinel:
+        if new_item is sentinel or (old_item is not sentinel and old_item < new_item):
+            yield 'removed', old_item
+            old_item = next(old, sentinel)
+        elif old_item is sentinel or new_item < old_item:
+            yield 'added', new_item
+            new_item = next(new, sentinel)
+        else:
+            yield 'common', new_item
+            old_item = next(old, sentinel)
+            new_item = next(new, sentinel)
+
+
+def iter_revisions(path):
+    """(title, revision) pairs of a sorted `title<TAB>revision` listing."""
+    for line in sorted_lines(path):
+        title, _, revision = line.partition(b'\t')
+        yield title, revision
+
+
+def changed_titles(old_revs, new_revs):
+    """
+    Titles in both revision listings whose revision differs. Listings are
+    `title<TAB>revision` lines, e.g. cut from a page table or stub dump.
+    """
+    old = iter_revisions(old_revs)
+    new = iter_revisions(new_revs)
+    sentinel = (None, None)
+    old_title, old_rev = next(old, sentinel)
+    new_title, new_rev = next(new, sentinel)
+    while old_title is not None and new_title is not None:
+        if old_title < new_title:
+            old_title, old_rev = next(old, sentinel)
+        elif new_title < old_title:
+            new_title, new_rev = next(new, sentinel)
+        else:
+            if old_rev != new_rev:
+                yield new_title
+            old_title, old_rev = next(old, sentinel)
+            new_title, new_rev = next(new, sentinel)
+
+
+class _DumpWriter:
+    """Writes titles as a dump file (with the page_title header) so it can be fed to any dump reader."""
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = open(path, 'wb')
+        self._file.write(DUMP_HEADER + b'\n')
+
+    def write(self, title):
+        self._file.write(title + b'\n')
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+
+def diff_dumps(old_dump, new_dump, out_dir, old_revs=None, new_revs=None):
+    """
+    Compares two title dumps and writes `added.txt` and `removed.txt` to
+    `out_dir`, plus `changed.txt` when both revision listings are given.
+
+    Returns:
+        dict: Output path of each title set.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    added = _DumpWriter(os.path.join(out_dir, "added.txt"))
+    removed = _DumpWriter(os.path.join(out_dir, "removed.txt"))
+    common = 0
+    for status, title in diff_sorted(sorted_lines(old_dump), sorted_lines(new_dump)):
+        if status == 'added':
+            added.write(title)
+        elif status == 'removed':
+            removed.write(title)
+        else:
+            common += 1
+    added.close()
+    removed.close()
+    print(f"{added.count} added, {removed.count} removed, {common} unchanged titles")
+    paths = {'added': added.path, 'removed': removed.path}
+
+    if old_revs and new_revs:
+        changed = _DumpWriter(os.path.join(out_dir, "changed.txt"))
+        for title in changed_titles(old_revs, new_revs):
+            changed.write(title)
+        changed.close()
+        print(f"{changed.count} titles with a new revision")
+        paths['changed'] = changed.path
+    return paths
+
+
+def enqueue_delta(paths, lang, queue_path, manifest_path=None):
+    """
+    Queues the added titles, and re-queues changed ones. Changed titles are
+    also invalidated in the run manifest, so workers render them again
+    instead of skipping them as done.
+    """
+    queue = WorkQueue(queue_path)
+    print(f"Enqueued {queue.enqueue_many(jobs_from_dump(paths['added'], lang))} added titles")
+    if 'changed' in paths:
+        changed = list(jobs_from_dump(paths['changed'], lang))
+        print(f"Re-queued {queue.requeue(changed)} changed titles")
+        if manifest_path:
+            manifest = RunManifest(manifest_path, verify="none")
+            for _, title, _, _, _ in changed:
+                manifest.invalidate(lang, title)
+            manifest.close()
+    print(queue.counts())
+    queue.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Diff two title dumps and queue only what changed.")
+    parser.add_argument('old', help="Previous *-all-titles-in-ns0.txt dump.")
+    parser.add_argument('new', help="Refreshed dump.")
+    parser.add_argument('--out', default="dump_diff", help="Folder for added.txt / removed.txt / changed.txt.")
+    parser.add_argument('--old-revs', help="title<TAB>revision listing matching the old dump.")
+    parser.add_argument('--new-revs', help="title<TAB>revision listing matching the new dump.")
+    parser.add_argument('--queue', help="Enqueue added (and changed) titles in this work queue.")
+    parser.add_argument('--lang', help="Language code of the dumps, needed with --queue.")
+    parser.add_argument('--manifest', default="dumps_full/manifest.jsonl",
+                        help="Run manifest in which changed titles are invalidated.")
+    args = parser.parse_args()
+    if args.queue and not args.lang:
+        parser.error("--queue needs --lang")
+
+    paths = diff_dumps(args.old, args.new, args.out, args.old_revs, args.new_revs)
+    if args.queue:
+        enqueue_delta(paths, args.lang, args.queue, args.manifest)
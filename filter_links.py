@@ -1,8 +1,15 @@
 import requests
 from bs4 import BeautifulSoup
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from adaptive_concurrency import AdaptiveLimiter
+from rate_limiter import RateLimiter
 
-def is_article_valid(url, min_length=1000, min_sections=5, min_images=2, min_citations=10):
+# Per-host token bucket shared with the other scripts (rates in rate_limiter.py)
+rate_limiter = RateLimiter()
+
+def is_article_valid(url, min_length=1000, min_sections=5, min_images=2, min_citations=10, limiter=None):
     """
     Checks if a Wikipedia article meets a set of criteria based on its content.
 
@@ -12,6 +19,8 @@ def is_article_valid(url, min_length=1000, min_sections=5, min_images=2, min_cit
         min_sections (int): The minimum number of sections.
         min_images (int): The minimum number of images.
         min_citations (int): The minimum number of citations/references.
+        limiter (AdaptiveLimiter): Optional concurrency limiter the fetch is
+            made through and reported to.
 
     Returns:
         bool: True if the article meets all criteria, False otherwise.
@@ -19,7 +28,20 @@ def is_article_valid(url, min_length=1000, min_sections=5, min_images=2, min_cit
     try:
         # Fetch the Wikipedia page content
         headers = {'User-Agent': 'assamese_link_retriever'}
-        response = requests.get(url, timeout=10, headers = headers)
+        if limiter is None:
+            rate_limiter.acquire(url)
+            response = requests.get(url, timeout=10, headers = headers)
+        else:
+            with limiter.slot():
+                # Wait for our turn on this host
+                rate_limiter.acquire(url)
+                started = time.monotonic()
+                try:
+                    response = requests.get(url, timeout=10, headers = headers)
+                except requests.exceptions.RequestException:
+                    limiter.record(time.monotonic() - started, error=True)
+                    raise
+                limiter.record_response(response, time.monotonic() - started)
         response.raise_for_status()  # Raise an exception for bad status codes
         
         soup = BeautifulSoup(response.text, 'html.parser')
@@ -70,6 +92,26 @@ def is_article_valid(url, min_length=1000, min_sections=5, min_images=2, min_cit
         print(f"An error occurred: {e}")
         return False
 
+def filter_articles(urls, limiter=None, **criteria):
+    """
+    Checks many articles in parallel, with the number of requests in flight
+    set by an adaptive limiter that backs off on 429s and slow responses.
+    Every request also waits for the per-host token bucket.
+
+    Args:
+        urls (list): Wikipedia article URLs.
+        limiter (AdaptiveLimiter): Limiter to use; a new one is made if None.
+        **criteria: Thresholds passed on to is_article_valid.
+
+    Returns:
+        list: The URLs that meet the criteria, in input order.
+    """
+    limiter = limiter or AdaptiveLimiter(initial=2, max_limit=8, latency_target=5, name="filter_links")
+    with ThreadPoolExecutor(max_workers=limiter.max_limit) as executor:
+        results = list(executor.map(lambda url: is_article_valid(url, limiter=limiter, **criteria), urls))
+    print(f"Concurrency: {limiter.metrics()}")
+    return [url for url, valid in zip(urls, results) if valid]
+
 # Example usage:
 if __name__ == "__main__":
     # Replace these URLs with the Wikipedia links you want to filter
@@ -78,9 +120,9 @@ if __name__ == "__main__":
         "https://bn.wikipedia.org/wiki/%E0%A6%B9%E0%A6%BE%E0%A6%B8%E0%A6%BF", # This article may not pass some filters
     ]
 
+    valid_links = filter_articles(wikipedia_links)
     for link in wikipedia_links:
-        print(f"\n--- Checking article: {link} ---")
-        if is_article_valid(link):
-            print(f"✅ The article passes all filters.")
+        if link in valid_links:
+            print(f"✅ {link} passes all filters.")
         else:
-            print(f"❌ The article does not meet the criteria.")
\ No newline at end of file
+            print(f"❌ {link} does not meet the criteria.")
\ No newline at end of file
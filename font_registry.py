@@ -0,0 +1,238 @@
+import asyncio
+import base64
+import hashlib
+import io
+import os
+import random
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from fontTools import subset as font_subset
+except ImportError:
+    font_subset = None
+
+# Characters the shaping engine may insert or need even when they are not in
+# the article text: ZWNJ / ZWJ, the dotted circle used for broken clusters,
+# and plain / no-break spaces.
+SHAPING_CODEPOINTS = {0x200C, 0x200D, 0x25CC, 0x20, 0xA0}
+
+# JavaScript run in the page to collect the code points used inside #content
+CONTENT_CODEPOINTS_JS = """
+() => {
+    const content = document.querySelector('#content') || document.body;
+    const seen = new Set();
+    for (const ch of content.textContent) {
+        seen.add(ch.codePointAt(0));
+    }
+    return Array.from(seen);
+}
+"""
+
+
+def generate_font_css(font_path, font_name):
+    with open(font_path, "rb") as font_file:
+        return font_face_css(font_file.read(), font_name)
+
+
+def font_face_css(font_bytes, font_name):
+    encoded_string = base64.b64encode(font_bytes).decode('utf-8')
+
+    return f"""
+    @font-face {{
+        font-family: '{font_name}';
+        src: url('data:font/ttf;base64,{encoded_string}') format('truetype');
+        font-weight: normal;
+        font-style: normal;
+    }}
+    """
+
+
+def subset_font_bytes(font_path, codepoints):
+    """
+    Builds a TTF containing only the glyphs needed for `codepoints`.
+
+    All OpenType layout features and scripts are kept so GSUB/GPOS can still
+    form conjuncts, half forms and matra positions for Indic scripts; the glyph
+    closure pulls in every glyph those features can produce.
+
+    Args:
+        font_path (str): Path to the full TTF.
+        codepoints (iterable): Unicode code points present in the article.
+
+    Returns:
+        bytes: The subset font.
+    """
+    options = font_subset.Options()
+    options.layout_features = ['*']
+    options.layout_scripts = ['*']
+    options.name_IDs = ['*']
+    options.notdef_outline = True
+    options.hinting = False
+
+    font = font_subset.load_font(font_path, options)
+    subsetter = font_subset.Subsetter(options)
+    subsetter.populate(unicodes=set(codepoints) | SHAPING_CODEPOINTS)
+    subsetter.subset(font)
+
+    buffer = io.BytesIO()
+    font_subset.save_font(font, buffer, options)
+    return buffer.getvalue()
+
+
+async def collect_content_codepoints(page):
+    """Returns the set of code points present in the article content of `page`."""
+    return set(await page.evaluate(CONTENT_CODEPOINTS_JS))
+
+
+def font_id(font_path, fonts_root="fonts"):
+    """Stable ID of a font file, its path under `fonts_root` with forward slashes."""
+    return os.path.relpath(os.path.abspath(font_path), os.path.abspath(fonts_root)).replace(os.sep, '/')
+
+
+class CssCache:
+    """LRU cache of @font-face blocks, bounded by the total size of the blocks."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._blocks = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def get(self, key):
+        css = self._blocks.get(key)
+        if css is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._blocks.move_to_end(key)
+        return css
+
+    def put(self, key, css):
+        self._blocks[key] = css
+        self.bytes += len(css)
+        while self.bytes > self.max_bytes and len(self._blocks) > 1:
+            _, evicted = self._blocks.popitem(last=False)
+            self.bytes -= len(evicted)
+        return css
+
+
+class FontRegistry:
+    """
+    Indexes every language's paragraph fonts once at startup and keeps an LRU
+    cache of ready-to-inject @font-face blocks, so picking a font for an
+    article is an in-memory lookup instead of a directory listing plus a
+    base64 encode of the whole TTF.
+
+    Subset blocks are nearly always one-offs (each article has its own
+    character set), so they get their own smaller cache and never push the
+    reusable full-font blocks out. Subsetting itself runs in a process pool,
+    off the event loop the browser tabs share.
+    """
+
+    def __init__(self, languages, fonts_root="fonts", max_cache_bytes=256 * 1024 * 1024,
+                 max_subset_cache_bytes=32 * 1024 * 1024, subset_workers=None):
+        """
+        Args:
+            languages (iterable): Language folder names under `fonts_root` (e.g. "gujarati").
+            fonts_root (str): Root folder holding `<lang>/Paragraph/*.ttf`.
+            max_cache_bytes (int): Upper bound on the total size of cached full-font CSS blocks.
+            max_subset_cache_bytes (int): Upper bound on the total size of cached subset blocks.
+            subset_workers (int): Processes for font subsetting. Defaults to the CPU count.
+        """
+        self.fonts_root = fonts_root
+        self.max_cache_bytes = max_cache_bytes
+        self.fonts = {}
+        self._css_cache = CssCache(max_cache_bytes)
+        self._subset_cache = CssCache(max_subset_cache_bytes)
+        self.subset_workers = subset_workers
+        self._subset_executor = None
+        for lang in languages:
+            self.fonts[lang] = self._index_language(lang)
+
+    def _index_language(self, lang):
+        fonts_dir = os.path.abspath(os.path.join(self.fonts_root, lang, "Paragraph"))
+        if not os.path.isdir(fonts_dir):
+            print(f"No font directory for {lang}: {fonts_dir}")
+            return []
+        return sorted(os.path.join(fonts_dir, f) for f in os.listdir(fonts_dir) if f.endswith('.ttf'))
+
+    def font_id(self, font_path):
+        """Stable ID of a font file, its path under `fonts_root` (e.g. "gujarati/Paragraph/Foo.ttf")."""
+        return font_id(font_path, self.fonts_root)
+
+    def font_path(self, font_id):
+        """Path of the font file a font ID refers to."""
+        return os.path.join(os.path.abspath(self.fonts_root), *font_id.split('/'))
+
+    def get_random_font(self, lang):
+        """Returns the path of a random paragraph font for `lang`."""
+        fonts = self.fonts.get(lang)
+        if not fonts:
+            raise FileNotFoundError(f"No .ttf files indexed for language: {lang}")
+        return random.choice(fonts)
+
+    def font_css(self, font_path, font_name):
+        """
+        Returns the @font-face block for `font_path`, building and caching it
+        on first use. Least recently used blocks are dropped once the cache
+        grows past `max_cache_bytes`.
+        """
+        key = (font_path, font_name)
+        css = self._css_cache.get(key)
+        if css is None:
+            css = self._css_cache.put(key, generate_font_css(font_path, font_name))
+        return css
+
+    async def subset_font_css(self, font_path, font_name, codepoints):
+        """
+        Returns an @font-face block embedding only the glyphs for `codepoints`.
+        Subsets are cached by (font, character-set hash), so articles sharing
+        the same characters reuse the same block. The subset is built in the
+        registry's process pool. Falls back to the full font when fontTools
+        is not installed or subsetting fails.
+        """
+        if font_subset is None:
+            return self.font_css(font_path, font_name)
+
+        charset = ','.join(str(c) for c in sorted(codepoints))
+        charset_hash = hashlib.sha1(charset.encode('ascii')).hexdigest()
+        key = (font_path, font_name, charset_hash)
+        css = self._subset_cache.get(key)
+        if css is not None:
+            return css
+
+        if self._subset_executor is None:
+            self._subset_executor = ProcessPoolExecutor(self.subset_workers)
+        try:
+            font_bytes = await asyncio.get_event_loop().run_in_executor(
+                self._subset_executor, subset_font_bytes, font_path, set(codepoints)
+            )
+        except Exception as e:
+            print(f"Font subsetting failed for {font_path} ({e}), embedding full font")
+            return self.font_css(font_path, font_name)
+        return self._subset_cache.put(key, font_face_css(font_bytes, font_name))
+
+    def close(self):
+        """Shuts down the subsetting processes, if any were started."""
+        if self._subset_executor is not None:
+            self._subset_executor.shutdown()
+            self._subset_executor = None
+
+    def stats(self):
+        return {
+            'languages': len(self.fonts),
+            'fonts': sum(len(f) for f in self.fonts.values()),
+            'cached_blocks': len(self._css_cache),
+            'cached_bytes': self._css_cache.bytes,
+            'hits': self._css_cache.hits,
+            'misses': self._css_cache.misses,
+            'cached_subsets': len(self._subset_cache),
+            'subset_bytes': self._subset_cache.bytes,
+            'subset_hits': self._subset_cache.hits,
+            'subset_misses': self._subset_cache.misses,
+        }
@@ -2,12 +2,17 @@ import asyncio
 from pyppeteer import launch
 import pandas as pd
 import requests
-import time
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from adaptive_concurrency import THROTTLE_STATUSES, AdaptiveLimiter
+from rate_limiter import RateLimiter
 
-# Set a delay to respect Wikipedia's rate limits (e.g., 1 second)
-# Wikipedia suggests no more than one request per second.
-DELAY = 1
+# Per-host token bucket shared with the other scripts, to respect Wikipedia's
+# rate limits (rates in rate_limiter.py)
+rate_limiter = RateLimiter()
+# Requests in flight, raised while latency is healthy and cut on 429 / 503
+concurrency = AdaptiveLimiter(initial=2, max_limit=8, latency_target=5, name="get_html")
 
 # Define the folder to save the HTML files
 HTML_FOLDER = 'html_files/tourism'
@@ -24,7 +29,40 @@ except FileNotFoundError:
     print("Error: The CSV file was not found.")
     exit()
 
-# Iterate through each row in the DataFrame
+def download(link, filepath, attempts=3):
+    """Downloads one page, backing off through the adaptive limiter on 429 / 503."""
+    for attempt in range(attempts):
+        with concurrency.slot():
+            # Wait for our turn on this host, then send a GET request to the link
+            rate_limiter.acquire(link)
+            started = time.monotonic()
+            try:
+                response = requests.get(link, timeout=10)
+            except requests.exceptions.RequestException as e:
+                concurrency.record(time.monotonic() - started, error=True)
+                print(f"Error downloading {link}: {e} ❌")
+                return
+            concurrency.record_response(response, time.monotonic() - started)
+
+        if response.status_code in THROTTLE_STATUSES and attempt < attempts - 1:
+            print(f"Throttled on {link} ({response.status_code}), retrying")
+            continue
+        try:
+            response.raise_for_status()  # Raise an HTTPError for bad responses (4xx or 5xx)
+        except requests.exceptions.RequestException as e:
+            print(f"Error downloading {link}: {e} ❌")
+            # You might want to log the error or handle it differently
+            return
+
+        # Save the HTML content to a file
+        with open(filepath, 'w', encoding='utf-8') as file:
+            file.write(response.text)
+
+        print(f"Downloaded {link} to {filepath} ✅")
+        return
+
+
+jobs = []
 for index, row in df.iterrows():
     link = row['wikipedia_link']
     if pd.isna(row['wikipedia_link']):
@@ -33,26 +71,12 @@ for index, row in df.iterrows():
 
     # Create the filename from the keyword, replacing invalid characters
     filename = f"{keyword.replace('/', '_').replace(':', '_')}.html"
-    filepath = os.path.join(HTML_FOLDER, filename)
-
-    print(f"Downloading {link} to {filepath}...")
-
-    try:
-        # Send a GET request to the link
-        response = requests.get(link, timeout=10)
-        response.raise_for_status()  # Raise an HTTPError for bad responses (4xx or 5xx)
-
-        # Save the HTML content to a file
-        with open(filepath, 'w', encoding='utf-8') as file:
-            file.write(response.text)
-
-        print("Download successful! ✅")
-
-    except requests.exceptions.RequestException as e:
-        print(f"Error downloading {link}: {e} ❌")
-        # You might want to log the error or handle it differently
+    jobs.append((link, os.path.join(HTML_FOLDER, filename)))
 
-    # Pause for the specified delay to avoid hitting rate limits
-    time.sleep(DELAY)
+# Downloads run in parallel; the adaptive limiter decides how many are in flight
+with ThreadPoolExecutor(max_workers=concurrency.max_limit) as executor:
+    for count, _ in enumerate(executor.map(lambda job: download(*job), jobs), 1):
+        if count % 100 == 0:
+            print(f"{count}/{len(jobs)} done, concurrency: {concurrency.metrics()}")
 
-print("\nAll downloads complete.")
\ No newline at end of file
+print("\nAll downloads complete.", concurrency.metrics())
@@ -1,14 +1,25 @@
 import requests
 from bs4 import BeautifulSoup
 import pandas as pd
-import time
 import collections
+import time
+from concurrent.futures import ThreadPoolExecutor
+from adaptive_concurrency import AdaptiveLimiter
+from rate_limiter import RateLimiter
 
 def get_assamese_wiki_links(page_url, lang): # , filename
     try:
         # Send a GET request to the page
         headers = {'User-Agent': 'assamese_link_retriever'}
-        response = requests.get(page_url, headers = headers)
+        with concurrency.slot():
+            rate_limiter.acquire(page_url)
+            started = time.monotonic()
+            try:
+                response = requests.get(page_url, headers = headers)
+            except requests.exceptions.RequestException:
+                concurrency.record(time.monotonic() - started, error=True)
+                raise
+            concurrency.record_response(response, time.monotonic() - started)
 
         # html_content = response.text
         # Specify the file name
@@ -44,6 +55,8 @@ def get_assamese_wiki_links(page_url, lang): # , filename
 # Example usage: Replace with your desired Assamese Wikipedia page URL
 
 lang = 'or'
+rate_limiter = RateLimiter()
+concurrency = AdaptiveLimiter(initial=2, max_limit=8, latency_target=5, name="get_links")
 
 df = pd.read_csv(f'lang_links/{lang}_links.csv')
 # df = df[500:]
@@ -53,20 +66,23 @@ total_links = df[f'{lang}_wiki_link']
 unique = set(total_links)
 total_links = list(total_links)
 
-while total_links:
-    url = total_links.pop(0)
-    if pd.isna(url):
-        continue
-    # keyw = row['Keyword']
-    # keyw.replace(' ', '_')
-    print(f"Retrieving {lang} page from {url}") # {keyw}
-    found_links = get_assamese_wiki_links(url, lang) # keyw
-    for link in found_links:
-        if link not in unique:
-            unique.add(link)
-            total_links.append(link)
-
-    time.sleep(0.3)
+def fetch(url):
+    print(f"Retrieving {lang} page from {url}")
+    return get_assamese_wiki_links(url, lang)
+
+# The crawl runs breadth-first one level at a time; pages of a level are
+# fetched in parallel, as many at once as the adaptive limiter allows
+frontier = [url for url in total_links if not pd.isna(url)]
+with ThreadPoolExecutor(max_workers=concurrency.max_limit) as executor:
+    while frontier:
+        next_frontier = []
+        for found_links in executor.map(fetch, frontier):
+            for link in found_links:
+                if link not in unique:
+                    unique.add(link)
+                    next_frontier.append(link)
+        print(f"{len(unique)} links so far, concurrency: {concurrency.metrics()}")
+        frontier = next_frontier
 
 
 final_links = list(unique)
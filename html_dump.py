@@ -0,0 +1,148 @@
+import asyncio
+import json
+import os
+import tarfile
+from bs4 import BeautifulSoup
+import main_scaled
+from job_sizes import length_from_content_html
+from work_queue import WorkQueue
+
+# Vector skin styles, so dump articles (bare Parsoid HTML) print like live pages.
+# Served from the resource cache once it has been fetched.
+SKIN_STYLESHEET = "/w/load.php?lang={code}&modules=skins.vector.styles&only=styles&skin=vector-2022"
+
+
+def iter_dump_articles(archive_path, namespace=0):
+    """
+    Streams the articles of a Wikimedia HTML dump: a tar.gz of NDJSON files
+    with one article record per line. The archive is read and decompressed
+    sequentially, one member and one line at a time, so memory stays flat
+    however large it is.
+
+    Args:
+        archive_path (str): The downloaded `*-NS0-*-ENTERPRISE-HTML.json.tar.gz`.
+        namespace (int): Only yield pages of this namespace (0 = articles).
+
+    Yields:
+        dict: 'title', 'url', 'lang' and 'html' of each article.
+    """
+    with tarfile.open(archive_path, mode='r|gz') as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            f = archive.extractfile(member)
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get('namespace', {}).get('identifier', namespace) != namespace:
+                    continue
+                html = record.get('article_body', {}).get('html')
+                if not html:
+                    continue
+                yield {
+                    'title': record['name'],
+                    'url': record.get('url'),
+                    'lang': record.get('in_language', {}).get('identifier'),
+                    'html': html,
+                }
+
+
+def wrap_dump_html(html, title, code):
+    """
+    Puts a dump article's Parsoid HTML into the #content / #firstHeading
+    structure of a rendered wiki page, which the layout CSS of main_scaled.py
+    targets, and links the skin styles.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    body = soup.body or soup
+    content = soup.new_tag('div', id='content', attrs={'class': 'mw-body'})
+    heading = soup.new_tag('h1', id='firstHeading', attrs={'class': 'firstHeading'})
+    heading.string = title
+    text = soup.new_tag('div', id='mw-content-text', attrs={'class': 'mw-body-content'})
+    parser_output = soup.new_tag('div', attrs={'class': 'mw-parser-output'})
+    for child in list(body.contents):
+        parser_output.append(child.extract())
+    if soup.body is not None:
+        # Parsoid puts mw-parser-output on <body>; it now sits on the wrapper
+        soup.body.attrs.pop('class', None)
+    text.append(parser_output)
+    content.append(heading)
+    content.append(text)
+    body.append(content)
+
+    if soup.head is not None:
+        soup.head.append(soup.new_tag('link', rel='stylesheet', href=SKIN_STYLESHEET.format(code=code)))
+    return str(soup)
+
+
+def output_filename_for(title):
+    """Same name the title dumps give an article (see title_index.parse_dump_line)."""
+    return title.replace(' ', '_').replace('/', '_')
+
+
+def iter_dump_jobs(archive_path, code):
+    """(url, output_filename, code, html) render jobs for the articles of a dump archive."""
+    for article in iter_dump_articles(archive_path):
+        title = output_filename_for(article['title'])
+        url = article['url'] or f"https://{code}.wikipedia.org/wiki/{title}"
+        yield url, title, article['lang'] or code, wrap_dump_html(article['html'], article['title'], code)
+
+
+def store_archive(archive_path, code, queue_path=None):
+    """
+    Writes every article of a dump archive into the HTML store that offline
+    rendering reads (main_scaled.OFFLINE_HTML_DIRS[0]), and optionally
+    enqueues it, sized by the wikitext length its HTML suggests (the
+    work queue's size unit).
+    """
+    html_dir = main_scaled.OFFLINE_HTML_DIRS[0].format(code=code)
+    os.makedirs(html_dir, exist_ok=True)
+    queue = WorkQueue(queue_path) if queue_path else None
+    batch = []
+    stored = 0
+    for url, title, lang, html in iter_dump_jobs(archive_path, code):
+        path = os.path.join(html_dir, f"{title}.html")
+        with open(f"{path}.part", 'w', encoding='utf-8') as f:
+            f.write(html)
+        os.replace(f"{path}.part", path)
+        stored += 1
+        if queue is not None:
+            batch.append((lang, title, url, None, length_from_content_html(len(html.encode('utf-8')))))
+            if len(batch) >= 1000:
+                queue.enqueue_many(batch)
+                batch = []
+        if stored % 1000 == 0:
+            print(f"Stored {stored} articles from {archive_path}")
+    if queue is not None:
+        queue.enqueue_many(batch)
+        print("Work queue :", queue.counts())
+        queue.close()
+    print(f"Stored {stored} articles in {html_dir}")
+
+
+async def render_archive(archive_path, code):
+    """Renders a dump archive's articles straight from the stream, without storing their HTML."""
+    pool = main_scaled.open_run()
+    async with pool:
+        await pool.map(main_scaled.render_job, iter_dump_jobs(archive_path, code))
+        print("Browser pool :", pool.stats())
+    main_scaled.close_run()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Use a Wikimedia HTML dump archive as the article source.")
+    parser.add_argument('archive', help="A downloaded *-ENTERPRISE-HTML.json.tar.gz dump.")
+    parser.add_argument('--lang', required=True, help="Language code of the dump.")
+    parser.add_argument('--render', action='store_true',
+                        help="Render the articles as they stream in instead of storing their HTML.")
+    parser.add_argument('--queue', help="With storing, also enqueue the articles in this work queue.")
+    args = parser.parse_args()
+
+    if args.render:
+        asyncio.get_event_loop().run_until_complete(render_archive(args.archive, args.lang))
+    else:
+        store_archive(args.archive, args.lang, args.queue)
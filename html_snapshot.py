@@ -0,0 +1,63 @@
+import html
+import json
+import re
+
+# Name of the meta tag that carries how a compact snapshot was rendered
+META_NAME = "wiki-render"
+
+# The article subtree plus the document language, direction and skin stylesheets
+CONTENT_JS = """
+() => {
+    const content = document.querySelector('#content') || document.body;
+    return {
+        html: content.outerHTML,
+        stylesheets: Array.from(document.querySelectorAll('link[rel~="stylesheet"]'))
+            .map(link => link.href).filter(href => href),
+        lang: document.documentElement.lang || '',
+        dir: document.documentElement.dir || 'ltr',
+        title: document.title,
+    };
+}
+"""
+
+META_RE = re.compile(r'<meta name="' + META_NAME + r'" content="([^"]*)"')
+
+
+def build_snapshot(content_html, render_info, lang='', direction='ltr', title='', stylesheets=()):
+    """
+    Assembles a compact snapshot: the article's #content subtree in a bare
+    document, without page chrome, scripts, inline styles or the injected
+    layout CSS with its base64 font. The skin stylesheets stay linked (by
+    absolute URL), so a snapshot re-rendered offline keeps the infobox and
+    table styling. How the page was laid out is kept as JSON in a
+    <meta name="wiki-render"> tag.
+
+    Args:
+        content_html (str): outerHTML of #content.
+        render_info (dict): Font ID, layout parameters and anything else
+            needed to reproduce the render.
+        stylesheets (list): Absolute URLs of the page's stylesheet links.
+    """
+    meta = html.escape(json.dumps(render_info, ensure_ascii=False), quote=True)
+    links = "".join(f'<link rel="stylesheet" href="{html.escape(href, quote=True)}">\n' for href in stylesheets)
+    return (
+        f'<!DOCTYPE html>\n<html lang="{html.escape(lang)}" dir="{html.escape(direction)}">\n<head>\n'
+        f'<meta charset="utf-8">\n<meta name="{META_NAME}" content="{meta}">\n{links}'
+        f'<title>{html.escape(title)}</title>\n</head>\n<body>\n{content_html}\n</body>\n</html>\n'
+    )
+
+
+async def compact_snapshot(page, render_info):
+    """Takes a compact snapshot (see build_snapshot) of the article loaded in `page`."""
+    content = await page.evaluate(CONTENT_JS)
+    return build_snapshot(
+        content['html'], render_info, content['lang'], content['dir'], content['title'], content['stylesheets']
+    )
+
+
+def read_render_info(html_doc):
+    """The render info of a compact snapshot, or None for a full page snapshot."""
+    match = META_RE.search(html_doc[:4096])
+    if match is None:
+        return None
+    return json.loads(html.unescape(match.group(1)))
@@ -0,0 +1,33 @@
+import asyncio
+
+
+async def install_request_handlers(page, handlers):
+    """
+    Turns on request interception for a tab and routes every request through
+    `handlers` in order. Each handler is a coroutine function taking the
+    pyppeteer request and returning True once it has answered the request
+    (respond / abort). Requests no handler claims are continued to the network.
+
+    Args:
+        page (pyppeteer.page.Page): The tab to intercept.
+        handlers (list): Coroutine functions `handler(request) -> bool`.
+    """
+    await page.setRequestInterception(True)
+
+    async def route(request):
+        try:
+            for handler in handlers:
+                if await handler(request):
+                    return
+            await request.continue_()
+        except Exception as e:
+            # The page may have navigated away or been closed mid-request
+            print(f"Request interception error for {request.url}: {e}")
+
+    page.on('request', lambda request: asyncio.ensure_future(route(request)))
+
+
+async def abort_request(request):
+    """Handler that fails every request it sees. Put it last to keep a tab off the network."""
+    await request.abort()
+    return True
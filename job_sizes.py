@@ -0,0 +1,205 @@
+import os
+from array import array
+from urllib.parse import unquote
+import requests
+from offline_html import find_cached_html
+from rate_limiter import RateLimiter
+from title_index import load_index
+
+# Page lengths of a title dump are kept in `<dump>.sizes`: one unsigned 32-bit
+# byte length per title line, in the same order as the offset index.
+# Titles not looked up yet (or missing from the wiki) hold UNKNOWN_SIZE.
+UNKNOWN_SIZE = 0xFFFFFFFF
+
+# Titles per MediaWiki API query (the API maximum for normal clients)
+API_BATCH = 50
+
+# Rough bytes of article content HTML (#content, no page chrome) per byte of
+# wikitext. Job sizes are wikitext lengths, as the API reports them; content
+# HTML sizes are scaled down by this before they are compared with them.
+HTML_BYTES_PER_WIKITEXT_BYTE = 10
+
+# Bytes read from the top of a stored page to tell what kind of file it is
+HEAD_PROBE_BYTES = 16 * 1024
+
+
+def sizes_path_for(dump_path):
+    return f"{dump_path}.sizes"
+
+
+def length_from_content_html(content_bytes):
+    """Wikitext length estimated from the byte size of an article's content HTML."""
+    return content_bytes // HTML_BYTES_PER_WIKITEXT_BYTE
+
+
+def stored_content_size(html_path):
+    """
+    Byte size of the article content in a stored HTML file, or None when the
+    file is a full page. Compact snapshots (html_snapshot.py) and dump
+    articles (html_dump.py) hold little besides #content, so their file size
+    is used as is. Full pages carry tens of KB of chrome and scripts, and full
+    snapshots a base64 font, whatever the article's length, so their size
+    says nothing about it; they are recognised by scripts or the injected
+    font in their <head>.
+    """
+    try:
+        with open(html_path, 'rb') as f:
+            head = f.read(HEAD_PROBE_BYTES)
+        size = os.path.getsize(html_path)
+    except OSError:
+        return None
+    body_at = head.find(b'<body')
+    if body_at != -1:
+        head = head[:body_at]
+    if b'<script' in head or b'CustomFont' in head:
+        return None
+    return size
+
+
+def estimated_length(output_filename, search_dirs):
+    """
+    Wikitext length estimated from an article's stored content HTML, in the
+    same unit as the API page lengths in `<dump>.sizes`. None without stored
+    HTML, or when the stored HTML is a full page (see stored_content_size).
+    """
+    html_path = find_cached_html(output_filename, search_dirs)
+    if html_path is None:
+        return None
+    content_size = stored_content_size(html_path)
+    if content_size is None:
+        return None
+    return length_from_content_html(content_size)
+
+
+def page_title(line):
+    """Wiki page title of a dump line, which is a bare title or a full article URL."""
+    if line.startswith('http'):
+        return unquote(line.split('/wiki/', 1)[-1])
+    return line
+
+
+def fetch_page_lengths(lang, titles, session, rate_limiter):
+    """
+    Looks up the wikitext byte length of up to API_BATCH pages in one API query.
+
+    Args:
+        lang (str): Wiki language code.
+        titles (list): Page titles as they appear in the dump.
+        session (requests.Session): Session to send the query with.
+        rate_limiter (RateLimiter): Limiter for the wiki host.
+
+    Returns:
+        dict: Title -> page length, for the titles that exist.
+    """
+    url = f"https://{lang}.wikipedia.org/w/api.php"
+    rate_limiter.acquire(url)
+    response = session.get(url, params={
+        'action': 'query', 'prop': 'info', 'titles': '|'.join(titles),
+        'format': 'json', 'formatversion': 2,
+    }, timeout=30)
+    response.raise_for_status()
+    query = response.json().get('query', {})
+    # The API answers with normalised titles ("A_b" -> "A b"); map them back
+    original = {title: title for title in titles}
+    for change in query.get('normalized', []):
+        original[change['to']] = change['from']
+    return {
+        original.get(page['title'], page['title']): page['length']
+        for page in query.get('pages', []) if 'length' in page
+    }
+
+
+def build_sizes(dump_path, lang, user_agent="wiki-pdf-size-estimator"):
+    """
+    Fills `<dump>.sizes` with the page length of every title in a dump,
+    querying the wiki's API in batches. Lengths already in the file are kept,
+    so an interrupted build picks up where it stopped.
+    """
+    offsets = load_index(dump_path)
+    path = sizes_path_for(dump_path)
+    sizes = load_sizes(dump_path)
+    if sizes is None:
+        sizes = array('I', [UNKNOWN_SIZE]) * len(offsets)
+        with open(path, 'wb') as f:
+            sizes.tofile(f)
+
+    session = requests.Session()
+    session.headers['User-Agent'] = user_agent
+    rate_limiter = RateLimiter()
+    pending = [n for n in range(len(sizes)) if sizes[n] == UNKNOWN_SIZE]
+    print(f"{len(pending)} of {len(sizes)} titles in {dump_path} need a size")
+
+    with open(dump_path, 'rb') as dump, open(path, 'r+b') as out:
+        for start in range(0, len(pending), API_BATCH):
+            batch = pending[start:start + API_BATCH]
+            titles = {}
+            for n in batch:
+                dump.seek(offsets[n])
+                line = dump.readline().decode('utf-8').rstrip('\r\n')
+                if line:
+                    titles[page_title(line)] = n
+            try:
+                lengths = fetch_page_lengths(lang, list(titles), session, rate_limiter)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(f"Size lookup failed for titles {batch[0]}-{batch[-1]}: {e}")
+                continue
+            for title, length in lengths.items():
+                n = titles.get(title)
+                if n is not None:
+                    out.seek(n * sizes.itemsize)
+                    out.write(array('I', [min(length, UNKNOWN_SIZE - 1)]).tobytes())
+            if start // API_BATCH % 100 == 0:
+                print(f"Sized {start + len(batch)}/{len(pending)} titles")
+                out.flush()
+
+
+def load_sizes(dump_path):
+    """
+    Returns the page lengths of a dump's titles, or None if they were never
+    estimated or no longer match the dump's index.
+    """
+    path = sizes_path_for(dump_path)
+    if not os.path.exists(path):
+        return None
+    count = len(load_index(dump_path))
+    sizes = array('I')
+    if os.path.getsize(path) != count * sizes.itemsize:
+        return None
+    with open(path, 'rb') as f:
+        sizes.fromfile(f, count)
+    return sizes
+
+
+def longest_first(sized_jobs, window=2000):
+    """
+    Reorders a stream of jobs so the biggest go first, one window at a time.
+    Starting heavy articles early lets the light ones fill in around them
+    instead of a few giants running alone at the end of a batch. Sorting in
+    windows keeps memory bounded for dumps of millions of titles.
+
+    Args:
+        sized_jobs (iterable): (size, job) pairs. A size of None sorts last.
+        window (int): Jobs read and sorted at a time.
+
+    Yields:
+        job: The jobs, largest first within each window.
+    """
+    batch = []
+    for size, job in sized_jobs:
+        batch.append((size or 0, job))
+        if len(batch) >= window:
+            batch.sort(key=lambda pair: pair[0], reverse=True)
+            yield from (job for _, job in batch)
+            batch = []
+    batch.sort(key=lambda pair: pair[0], reverse=True)
+    yield from (job for _, job in batch)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Look up the page length of every title in a dump.")
+    parser.add_argument('dump', help="A *-all-titles-in-ns0.txt dump.")
+    parser.add_argument('--lang', required=True, help="Language code of the dump.")
+    args = parser.parse_args()
+    build_sizes(args.dump, args.lang)
@@ -4,6 +4,10 @@ import base64
 import random
 import os
 from bs4 import BeautifulSoup
+from font_registry import font_id
+from html_snapshot import compact_snapshot
+from interception import install_request_handlers
+from resource_cache import ResourceCache
 
 lang_code_mapping = {"as" : "assamese", "bn" : "bengali", "gu" : "gujarati", "hi" : "hindi","kn" : "kannada",
                     "ml" : "malayalam", "mr" : "marathi", "or" : "odia", "ta" : "tamil", "te" : "telugu"}
@@ -267,6 +271,9 @@ async def save_wikipedia_article_as_pdf(url, output_filename, chrome_path):
     browser = await launch(headless=True, executablePath = chrome_path)
     # Open a new page (tab) in the browser
     page = await browser.newPage()
+    # Serve shared skin CSS / JS / images from the local resource cache
+    resource_cache = ResourceCache()
+    await install_request_handlers(page, [resource_cache.attach(page)])
 
     try:
         print(f"Navigating to {url}...")
@@ -361,7 +368,14 @@ async def save_wikipedia_article_as_pdf(url, output_filename, chrome_path):
         # Save as HTML
         output_f = output_filename.split('.')[0]
         html_filename = f"{output_f}.html"
-        html_content = await page.content()
+        if COMPACT_HTML:
+            html_content = await compact_snapshot(page, {
+                'url': url,
+                'font': font_id(paragraph_font_path),
+                'layout': {'width': rand_width, 'height': rand_height, 'columns': num_columns, 'font_size': font_size},
+            })
+        else:
+            html_content = await page.content()
         with open(html_filename, 'w', encoding='utf-8') as f:
             f.write(html_content)
         print(f"Successfully saved HTML to {html_filename}")
@@ -369,12 +383,15 @@ async def save_wikipedia_article_as_pdf(url, output_filename, chrome_path):
     finally:
         # Close the browser
         await browser.close()
+        resource_cache.close()
 
 # The URL of the Wikipedia article to save
 article_url = 'https://bn.wikipedia.org/wiki/States_and_union_territories_of_India' # 'https://en.wikipedia.org/wiki/Arunachal_Pradesh' - https://en.wikipedia.org/wiki/States_and_union_territories_of_India
 # The desired name for the output PDF file
 pdf_output = 'test2.pdf'
 chrome_path = "C:/Program Files/Google/Chrome/Application/chrome.exe"
+# Save only the article subtree with the font and layout as parameters (see html_snapshot.py)
+COMPACT_HTML = True
 
 # Run the asynchronous function
 asyncio.get_event_loop().run_until_complete(
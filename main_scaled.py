@@ -1,45 +1,37 @@
+import argparse
 import asyncio
-from pyppeteer import launch
-import base64
+import io
+import json
+import multiprocessing
 import random
 import os
 import time
+from datetime import datetime, timezone
 import pandas as pd
+from browser_pool import BrowserPool, browser_alive, exclude_from_latency
+from job_sizes import UNKNOWN_SIZE, estimated_length, load_sizes, longest_first
+from font_registry import FontRegistry, collect_content_codepoints
+from html_snapshot import compact_snapshot
+from content_store import ContentStore, link_file, page_content_hash, renamed_path
+from interception import abort_request, install_request_handlers
+from offline_html import HTML_STORE_DIRS, find_cached_html, set_offline_content
+from pdf_stream import stream_pdf
+from rate_limiter import RateLimiter
+from adaptive_concurrency import THROTTLE_STATUSES, AdaptiveLimiter
+from render_sidecar import RenderIndex, build_sidecar, sidecar_path_for, write_sidecar
+from request_filter import DEFAULT_RULES, RequestFilter
+from resource_cache import ResourceCache
+from run_manifest import RunManifest
+from shard_writer import ShardWriter
+from skip_ledger import SkipArticle, SkipLedger, backoff_delay, load_failed
+from title_index import iter_shard, load_index, parse_dump_line
+from plan_jobs import melt_master
+from work_queue import WorkQueue, default_worker_id
 
 lang_code_mapping = {"as" : "assamese", "bn" : "bengali", "gu" : "gujarati", "hi" : "hindi","kn" : "kannada",
                     "ml" : "malayalam", "mr" : "marathi", "or" : "odia", "ta" : "tamil", "te" : "telugu"}
 
-def get_random_font(fonts_dir):
-    fonts_dir = os.path.abspath(fonts_dir)
-    fonts = [f for f in os.listdir(fonts_dir) if f.endswith('.ttf')]
-    if not fonts:
-        raise FileNotFoundError(f"No .ttf files found in directory: {fonts_dir}")
-    return os.path.join(fonts_dir, random.choice(fonts))
-
-def generate_font_css(font_path, font_name):
-    with open(font_path, "rb") as font_file:
-        encoded_string = base64.b64encode(font_file.read()).decode('utf-8')
-    
-    return f"""
-    @font-face {{
-        font-family: '{font_name}';
-        src: url('data:font/ttf;base64,{encoded_string}') format('truetype');
-        font-weight: normal;
-        font-style: normal;
-    }}
-    """
-
-async def save_wikipedia_article_as_pdf(url, output_filename, code, chrome_path, user_agent):
-    """
-    Renders a Wikipedia article as a PDF.
-
-    Args:
-        url (str): The URL of the Wikipedia article.
-        output_filename (str): The name of the output PDF file.
-    """
-    # Launch a headless Chromium browser instance
-    global skipped_pages
-    css_string = """
+CSS_TEMPLATE = """
             --font--
             #content * {
                 font-family: "CustomFont", serif !important;
@@ -79,119 +71,485 @@ async def save_wikipedia_article_as_pdf(url, output_filename, code, chrome_path,
             }
             
             """
+
+
+def sample_layout():
+    """
+    Picks a random page size, column count and font size for one render.
+    Wider pages allow more columns.
+    """
+    rand_width = random.randint(800, 1600)
+    rand_height = random.randint(800, 1600)
+
+    if rand_width > 1400:
+        num_columns = random.choice([1,2,3,4])
+    elif rand_width > 1200:
+        num_columns = random.choice([1,2,3])
+    elif rand_width > 1000:
+        num_columns = random.choice([1,2])
+    else:
+        num_columns = 1
+    font_size = random.randint(12,16)
+
+    return {'width': rand_width, 'height': rand_height, 'columns': num_columns, 'font_size': font_size}
+
+
+def build_css(font_css, layout):
+    css_string = CSS_TEMPLATE.replace("--font--", font_css)
+    css_string = css_string.replace('--fontsize--', str(layout['font_size']))
+    css_string = css_string.replace('--columns--', str(layout['columns']))
+    return css_string
+
+
+def pdf_options(layout):
+    return {
+        'width': f"{layout['width']}px",
+        'height': f"{layout['height']}px",
+        # 'format': 'A4',
+        # 'displayHeaderFooter': True, 
+        # 'headerTemplate': header_html,
+        # 'footerTemplate': footer_html,
+        'printBackground': True,  # This ensures images and colors are included
+        'landscape': False, # Orientation of PDF pages
+        'margin': {
+            'top': '10mm',          # or '20mm'
+            'right': '10mm',
+            'bottom': '10mm',
+            'left': '10mm'
+        }
+    }
+
+
+# Waits for the injected @font-face to be decoded before printing. Forcing a
+# layout first makes the browser notice the new face; load() then starts it
+# even if nothing has asked for it yet.
+FONT_READY_JS = """
+async (family) => {
+    document.body.offsetHeight;
+    await document.fonts.load(`1em "${family}"`);
+    await document.fonts.ready;
+    return true;
+}
+"""
+
+
+async def apply_style(page, style_handle, css_string, font_name='CustomFont'):
+    """
+    Injects the layout CSS. The first call adds a style tag; later calls swap
+    the contents of that same tag so a loaded page can be re-laid out in place.
+    Either way it waits until the new font has loaded, so no variant prints
+    with the fallback font.
+    """
+    if style_handle is None:
+        style_handle = await page.addStyleTag({
+            'content': css_string
+        })
+    else:
+        await page.evaluate('(style, css) => { style.textContent = css; }', style_handle, css_string)
+    try:
+        await asyncio.wait_for(page.evaluate(FONT_READY_JS, font_name), FONT_LOAD_TIMEOUT)
+    except asyncio.TimeoutError:
+        print(f"Timed out waiting for font {font_name}, printing anyway")
+    return style_handle
+
+
+async def snapshot_html(page, url, font_path, layout):
+    """The HTML saved next to a render: a compact snapshot or the full page, per HTML_SNAPSHOT."""
+    if HTML_SNAPSHOT == "compact":
+        return await compact_snapshot(page, {
+            'url': url,
+            'font': font_registry.font_id(font_path),
+            'subset': SUBSET_FONTS,
+            'layout': layout,
+        })
+    return await page.content()
+
+
+async def load_article(page, url, output_filename, code, html=None):
+    """
+    Loads an article into `page`, either by navigating to `url` or, in
+    offline mode or when `html` is given (e.g. from an HTML dump archive),
+    from that HTML with setContent. Navigation errors and timeouts propagate
+    so the caller can retry them.
+    """
+    if html is None and RENDER_SOURCE == "offline":
+        search_dirs = [d.format(code=code) for d in OFFLINE_HTML_DIRS]
+        html_path = find_cached_html(output_filename, search_dirs)
+        if html_path is None:
+            raise SkipArticle(f"No stored HTML for {output_filename}")
+        print(f"Loading {html_path}...")
+        with open(html_path, 'r', encoding='utf-8') as f:
+            html = f.read()
+    if html is not None:
+        await asyncio.wait_for(
+            set_offline_content(page, html, OFFLINE_ASSET_BASE.format(code=code)), NAVIGATION_TIMEOUT
+        )
+        return
+
+    waiting_since = time.monotonic()
+    async with nav_limiter.async_slot():
+        await rate_limiter.acquire_async(url)
+        # Queueing for the limiters is not the browser's time
+        exclude_from_latency(page, time.monotonic() - waiting_since)
+        print(f"Navigating to {url}...")
+        started = time.monotonic()
+        try:
+            # Navigate to the specified URL
+            response = await page.goto(url, {'waitUntil': 'networkidle0', 'timeout': NAVIGATION_TIMEOUT * 1000})
+        except Exception:
+            nav_limiter.record(time.monotonic() - started, error=True)
+            raise
+        status = response.status if response is not None else None
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        nav_limiter.record(time.monotonic() - started, status, retry_after)
+    if status in THROTTLE_STATUSES:
+        # Do not print the error page; the retry waits for the limiter to reopen
+        raise RuntimeError(f"Throttled with HTTP {status} on {url}")
+
+
+async def save_wikipedia_article_as_pdf(page, url, output_filename, code, num_variants=None, html=None):
+    """
+    Renders a Wikipedia article as a PDF.
+
+    The article is loaded once and then rendered `num_variants` times, each
+    with its own random page size, column count, font size and font, by
+    swapping the injected style tag in place. With more than one variant the
+    outputs are suffixed `_v0`, `_v1`, ...
+
+    Args:
+        page (pyppeteer.page.Page): A tab borrowed from the browser pool.
+        url (str): The URL of the Wikipedia article.
+        output_filename (str): The name of the output PDF file.
+        code (str): Language code, used for the output folder.
+        num_variants (int): Layouts to render from the single page load. Defaults to NUM_VARIANTS.
+        html (str): Article HTML to render instead of loading `url`.
+
+    Each render also gets a JSON sidecar (dumps_full/{code}/meta/) and a line
+    in the run's render index, see render_sidecar.py.
+
+    Returns:
+        list: Paths of the PDF, HTML and sidecar files written, or with OUTPUT_FORMAT
+        "shards" their entries in the shard (see ShardWriter.add).
+    """
+    global font_registry
+    if num_variants is None:
+        num_variants = NUM_VARIANTS
     try:
         lang_code = url.split('.')[0][-2:]
         lang = lang_code_mapping[lang_code]
     except Exception as e:
-        print("URL Error. Skipping")
-        return
-    paragraph_fonts_dir = os.path.join("fonts", lang, "Paragraph")
-    paragraph_font_path = get_random_font(paragraph_fonts_dir)
-    font_css = generate_font_css(paragraph_font_path, 'CustomFont')
-    css_string = css_string.replace("--font--", font_css)
+        raise SkipArticle(f"URL Error: {url}")
 
-    
-    browser = await launch(headless=True, executablePath = chrome_path)
     output_dir = "dumps_full"
-    # Open a new page (tab) in the browser
-    page = await browser.newPage()
-    await page.setUserAgent(user_agent)
 
-    try:
-        print(f"Navigating to {url}...")
-        # Navigate to the specified URL
-        try:
-            await page.goto(url, {'waitUntil': 'networkidle0'})
-        except Exception as e:
-            print("Error loading page, skipping")
-            skipped_pages.append(f"{output_filename}")
-            return
+    await load_article(page, url, output_filename, code, html)
 
-        rand_width = random.randint(800, 1600)
-        random_width = f'{rand_width}px'
-        random_height = f'{random.randint(800, 1600)}px'
-        # print(random_width, random_height)
-
-        if rand_width > 1400:
-            num_columns = random.choice([1,2,3,4])
-        elif rand_width > 1200:
-            num_columns = random.choice([1,2,3])
-        elif rand_width > 1000:
-            num_columns = random.choice([1,2])
-        else:
-            num_columns = 1
-        font_size = random.randint(12,16)
+    content_hash = None
+    if content_store is not None:
+        content_hash = await page_content_hash(page, render_settings_salt(num_variants))
+        reused = reuse_render(content_hash, url, output_filename, code)
+        if reused is not None:
+            return reused
 
-        css_string = css_string.replace('--fontsize--', str(font_size))
-        css_string = css_string.replace('--columns--', str(num_columns))
-        # Make 2 column layout
-        print("Injecting CSS")
-        await page.addStyleTag({
-            'content': css_string
-        })
-
-        # await page.emulateMedia('screen') # Code to get the screen view instead of the print view
+    if SUBSET_FONTS:
+        codepoints = await collect_content_codepoints(page)
 
+    # await page.emulateMedia('screen') # Code to get the screen view instead of the print view
 
-        # Generate the PDF with some print options
+    if OUTPUT_FORMAT == "files":
         os.makedirs(f"{output_dir}/{code}/pdf/", exist_ok = True)
         os.makedirs(f"{output_dir}/{code}/html/", exist_ok = True)
-        pdf_path = f"{output_dir}/{code}/pdf/{output_filename}.pdf"
-        await page.pdf({
-            'path': pdf_path,
-            'width': random_width, 
-            'height': random_height,
-            # 'format': 'A4',
-            # 'displayHeaderFooter': True, 
-            # 'headerTemplate': header_html,
-            # 'footerTemplate': footer_html,
-            'printBackground': True,  # This ensures images and colors are included
-            'landscape': False, # Orientation of PDF pages
-            'margin': {
-                'top': '10mm',          # or '20mm'
-                'right': '10mm',
-                'bottom': '10mm',
-                'left': '10mm'
-            }
-        })
 
-        # print(pdf_string)
+    outputs = []
+    style_handle = None
+    for variant in range(num_variants):
+        variant_filename = output_filename if num_variants == 1 else f"{output_filename}_v{variant}"
+
+        paragraph_font_path = font_registry.get_random_font(lang)
+        if SUBSET_FONTS:
+            font_css = await font_registry.subset_font_css(paragraph_font_path, 'CustomFont', codepoints)
+        else:
+            font_css = font_registry.font_css(paragraph_font_path, 'CustomFont')
+        layout = sample_layout()
+
+        print("Injecting CSS")
+        style_handle = await apply_style(page, style_handle, build_css(font_css, layout))
+
+        if OUTPUT_FORMAT == "shards":
+            # Both files go into the current shard, the PDF buffered in memory
+            pdf_buffer = io.BytesIO()
+            await asyncio.wait_for(stream_pdf(page, pdf_buffer, pdf_options(layout)), PRINT_TIMEOUT)
+            html_content = await snapshot_html(page, url, paragraph_font_path, layout)
+            sidecar = await asyncio.get_event_loop().run_in_executor(
+                None, build_sidecar, code, variant_filename, url, font_registry.font_id(paragraph_font_path),
+                layout, pdf_buffer.getvalue(), html_content
+            )
+            outputs += shard_writer.add(code, variant_filename, {
+                'pdf': pdf_buffer.getvalue(),
+                'html': html_content.encode('utf-8'),
+                'json': json.dumps(sidecar, ensure_ascii=False).encode('utf-8'),
+            })
+            render_index.record(sidecar)
+            print(f"Successfully saved {variant_filename} to {shard_writer.shard_name}")
+            continue
+
+        # Generate the PDF with some print options
+        pdf_path = f"{output_dir}/{code}/pdf/{variant_filename}.pdf"
+        if STREAM_PDF:
+            await asyncio.wait_for(stream_pdf(page, pdf_path, pdf_options(layout)), PRINT_TIMEOUT)
+        else:
+            await asyncio.wait_for(page.pdf({'path': pdf_path, **pdf_options(layout)}), PRINT_TIMEOUT)
         print(f"Successfully saved PDF to {pdf_path}")
 
         # Save as HTML
-        html_filename = f"{output_dir}/{code}/html/{output_filename}.html"
-        html_content = await page.content()
-        with open(html_filename, 'w', encoding='utf-8') as f:
+        html_filename = f"{output_dir}/{code}/html/{variant_filename}.html"
+        html_content = await snapshot_html(page, url, paragraph_font_path, layout)
+        # newline='' keeps the file's bytes equal to what the sidecar hashes
+        with open(html_filename, 'w', encoding='utf-8', newline='') as f:
             f.write(html_content)
         print(f"Successfully saved HTML to {html_filename}")
 
+        # Layout, font, page count, sizes and hashes, for extraction and filtering.
+        # Hashing and the page count run off the event loop the tabs share.
+        sidecar = await asyncio.get_event_loop().run_in_executor(
+            None, build_sidecar, code, variant_filename, url, font_registry.font_id(paragraph_font_path),
+            layout, pdf_path, html_content
+        )
+        write_sidecar(sidecar_path_for(pdf_path), sidecar)
+        render_index.record(sidecar)
+        # The manifest takes the sidecar's sizes and hashes instead of hashing the files again
+        outputs += [
+            {'path': pdf_path, 'size': sidecar['pdf_bytes'], 'sha256': sidecar['pdf_sha256']},
+            {'path': html_filename, 'size': sidecar['html_bytes'], 'sha256': sidecar['html_sha256']},
+            sidecar_path_for(pdf_path),
+        ]
+
+    if content_hash is not None:
+        content_store.put(content_hash, code, output_filename, outputs)
+    return outputs
+
+
+def render_settings_salt(num_variants):
+    """Everything besides the article that decides what a render looks like."""
+    return f"{CSS_TEMPLATE}|{num_variants}|{HTML_SNAPSHOT}|{OUTPUT_FORMAT}"
+
+
+def reuse_render(content_hash, url, output_filename, code):
+    """
+    Returns outputs for an article whose content was rendered before, or
+    None if it needs rendering. The same title with unchanged content keeps
+    its previous outputs. Another title with the same content (a redirect,
+    or a duplicate reached under two names) gets links to that render's
+    files, or in shard mode index entries pointing at the same members.
+    """
+    stored = content_store.lookup(content_hash)
+    if stored is None:
+        return None
+    source_code, source_title, outputs = stored
+    # Only trust a render the manifest still vouches for
+    if source_code != code or not run_manifest.is_done(source_code, source_title):
+        return None
+    if source_title == output_filename:
+        content_store.reused += 1
+        print(f"Content of {output_filename} unchanged, keeping its previous render")
+        return outputs
+
+    content_store.aliased += 1
+    content_store.add_alias(content_hash, code, output_filename)
+    print(f"{output_filename} has the same content as {source_title}, linking its render")
+    if OUTPUT_FORMAT == "shards":
+        shard_writer.add_alias(code, output_filename, source_code, source_title)
+        return outputs
+    linked = []
+    for output in outputs:
+        path = output['path'] if isinstance(output, dict) else output
+        target = renamed_path(path, source_title, output_filename)
+        if path.endswith('.json'):
+            with open(path, 'r', encoding='utf-8') as f:
+                sidecar = json.load(f)
+            sidecar.update(title=os.path.basename(target)[:-len('.json')], url=url, alias_of=source_title)
+            write_sidecar(target, sidecar)
+            render_index.record(sidecar)
+        else:
+            link_file(path, target)
+            if isinstance(output, dict):
+                # Same bytes as the source, so its size and hash still hold
+                linked.append({**output, 'path': target})
+                continue
+        linked.append(target)
+    return linked
+
+
+async def render_job(page, url, output_filename, code, html=None):
+    """
+    Renders one article with bounded retries, unless the run manifest says it
+    is already done. Failed attempts back off exponentially with jitter; an
+    article that still fails, or fails in a way retrying cannot fix, is
+    written to the skip ledger.
+
+    Returns:
+        Exception: None on success, otherwise the error that made it give up.
+    """
+    global skipped_pages, skip_ledger, run_manifest
+    if not REFRESH_RENDERS and run_manifest.is_done(code, output_filename):
+        print(f"Already rendered {output_filename}, skipping")
+        return None
+    started = time.monotonic()
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            outputs = await save_wikipedia_article_as_pdf(page, url, output_filename, code, html=html)
+            run_manifest.record(code, output_filename, outputs)
+            if RETRY_FAILED_ONLY:
+                skip_ledger.record_resolved(code, output_filename, url)
+            return None
+        except Exception as e:
+            if not browser_alive(page):
+                # Let the pool re-queue the job on a fresh browser
+                raise
+            final = isinstance(e, SkipArticle) or attempt == MAX_ATTEMPTS
+            if final:
+                print(f"Skipping {output_filename} after {attempt} attempt(s): {type(e).__name__}: {e}")
+                skipped_pages.append(f"{output_filename}")
+                skip_ledger.record_failure(code, output_filename, url, e, attempt, time.monotonic() - started)
+                return e
+            delay = backoff_delay(attempt, RETRY_BASE_DELAY, RETRY_MAX_DELAY)
+            print(f"Attempt {attempt} failed for {output_filename} ({type(e).__name__}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            exclude_from_latency(page, delay)
+            try:
+                await page.goto('about:blank')
+            except Exception:
+                pass
+
+
+async def queue_job(page, job_id, url, output_filename, code):
+    """
+    Renders one leased queue job and reports the outcome back to the queue.
+    When the browser dies, render_job raises and the pool re-queues this job
+    on another tab; the lease stays in `leased_ids`, so it is heartbeated
+    until the job is finally completed or failed.
+    """
+    error = await render_job(page, url, output_filename, code)
+    try:
+        if error is None:
+            work_queue.complete(job_id, worker_id)
+        else:
+            work_queue.fail(job_id, worker_id, f"{type(error).__name__}: {error}")
+    finally:
+        leased_ids.discard(job_id)
+
+
+def queue_job_given_up(error, job_id, url, output_filename, code):
+    """Fails a queue job the browser pool stopped re-queueing (e.g. its browsers kept crashing)."""
+    try:
+        work_queue.fail(job_id, worker_id, f"{type(error).__name__}: {error}")
     finally:
-        # Close the browser
-        await browser.close()
-
-
-# df = pd.read_csv('master.csv')
-
-# # Manage current index in master csv file
-# df = df[337:]
-
-# for index, row in df.iterrows():
-    
-#     pdf_name = row['Keyword'].replace(' ', '_')
-#     domain = row['Domain']
-#     lang_codes = ["as", "bn", "gu", "hi", "kn", "ml", "mr", "or", "ta", "te"]
-
-#     for code in lang_codes:
-#         if not pd.isna(row[f"{code}_wiki_link"]):
-#             pdf_name2 = f"{pdf_name}_{code}"
-#             url = row[f"{code}_wiki_link"]
-#             # Run the asynchronous function
-#             asyncio.get_event_loop().run_until_complete(
-#                 save_wikipedia_article_as_pdf(url, pdf_name2, domain, code)
-#             )
-#             time.sleep(0.5)
-global skipped_pages
+        leased_ids.discard(job_id)
+
+
+def iter_queue_jobs(batch_size):
+    """Leases jobs from the work queue in batches until it runs dry."""
+    while True:
+        rows = work_queue.lease(worker_id, batch_size)
+        if not rows:
+            return
+        for job_id, lang, title, url, domain in rows:
+            leased_ids.add(job_id)
+            yield job_id, url, title, lang
+
+
+async def heartbeat_loop():
+    """Keeps the leases of queued and in-flight jobs alive while this worker runs."""
+    while True:
+        await asyncio.sleep(work_queue.lease_seconds / 3)
+        if leased_ids:
+            work_queue.heartbeat(worker_id, list(leased_ids))
+
+
+def iter_master_rows(csv_path, start_row=0):
+    """
+    Yields (row_index, keyword, jobs) for each master.csv row with language
+    links, where jobs are the row's (url, output_filename, code) renders, one
+    per link, melted and named by plan_jobs.melt_master.
+    """
+    links = melt_master(csv_path)
+    links = links[links['row'] >= start_row]
+    # groupby keeps the language order of the melt within each row
+    for index, row_links in links.groupby('row', sort=True):
+        jobs = list(zip(row_links['url'], row_links['title'], row_links['lang']))
+        yield index, row_links['keyword'].iloc[0], jobs
+
+
+def load_finished_rows(path):
+    """Indices of the master.csv rows the row ledger records as fully rendered."""
+    finished = set()
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if entry['complete']:
+                    finished.add(entry['row'])
+    return finished
+
+
+async def render_master(pool, csv_path, rows_path, start_row=0):
+    """
+    Fans each master.csv row out across the pool: all of a row's language
+    links are dispatched together and render in parallel, each on its own
+    wiki host (the rate limiter is per host) with its language's fonts. When
+    the last language of a row finishes, the row's outcome is appended to the
+    row ledger at `rows_path`; complete rows are skipped on the next run.
+    """
+    finished = load_finished_rows(rows_path)
+    print(f"Master rows : {len(finished)} already complete")
+    directory = os.path.dirname(rows_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    ledger = open(rows_path, 'a', encoding='utf-8')
+
+    async def finish_row(index, keyword, jobs, tasks):
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # The manifest, not the task results, says what actually made it to disk
+        languages = {code: run_manifest.is_done(code, output_filename) for _, output_filename, code in jobs}
+        entry = {
+            'row': int(index),
+            'keyword': keyword,
+            'languages': languages,
+            'complete': all(languages.values()),
+            'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        }
+        ledger.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        ledger.flush()
+        print(f"Row {index} ({keyword}) : {sum(languages.values())}/{len(languages)} languages rendered")
+
+    rows = []
+    for index, keyword, jobs in iter_master_rows(csv_path, start_row):
+        if index in finished or not jobs:
+            continue
+        tasks = [await pool.submit(render_job, *job) for job in jobs]
+        rows.append(asyncio.ensure_future(finish_row(index, keyword, jobs, tasks)))
+    await asyncio.gather(*rows)
+    ledger.close()
+
+
+global skipped_pages, font_registry, resource_cache, request_filter, skip_ledger, run_manifest
 skipped_pages = []
+skip_ledger = None
+run_manifest = None
+work_queue = None
+worker_id = default_worker_id()
+leased_ids = set()
+rate_limiter = None
+nav_limiter = None
+shard_writer = None
+render_index = None
+content_store = None
+font_registry = None
+resource_cache = None
+request_filter = None
 lang_codes = ["as", "bn", "gu", "hi", "kn", "ml", "mr", "or", "ta", "te"]
 
 dumps_folder = "wiki_dumps"
@@ -199,22 +557,290 @@ lang_to_use = "gu"
 chrome_path = "C:/Program Files/Google/Chrome/Application/chrome.exe"
 user_agent = "Gujarati Wikipedia PDF Bot (21f3002273@ds.study.iitm.ac.in)"
 
+# Browser pool size. Each browser keeps TABS_PER_BROWSER tabs open, so up to
+# NUM_BROWSERS * TABS_PER_BROWSER articles are rendered at the same time.
+NUM_BROWSERS = 2
+TABS_PER_BROWSER = 4
+
+# Browser recycling. A browser is drained and replaced after this many pages,
+# or when its processes pass the memory limit (needs psutil) or its recent
+# pages take longer than MAX_MEAN_LATENCY seconds on average. None disables a limit.
+MAX_PAGES_PER_BROWSER = 500
+MAX_BROWSER_RSS_MB = 3072
+MAX_MEAN_LATENCY = 60
+
+# Article loads per wiki host are capped by the token buckets in RATE_LIMIT_DIR,
+# shared by every worker process and script; the per-host rates are set in
+# rate_limiter.py (DEFAULT_RATE / HOST_RATES)
+RATE_LIMIT_DIR = "rate_limits"
+
+# Article navigations in flight. Starts at NAV_CONCURRENCY, grows while pages
+# load within NAV_LATENCY_TARGET seconds (p95) and halves on HTTP 429 / 503,
+# errors or slow loads, never above the pool capacity. Retry-After pauses it.
+NAV_CONCURRENCY = 2
+NAV_LATENCY_TARGET = 30
+
+# Memory cap for the cached @font-face blocks (base64 fonts are large)
+FONT_CSS_CACHE_BYTES = 256 * 1024 * 1024
+# Separate, smaller cap for subset blocks, which are rarely reused
+FONT_SUBSET_CACHE_BYTES = 32 * 1024 * 1024
+# Processes building font subsets off the event loop
+FONT_SUBSET_WORKERS = 2
+# Embed only the glyphs used in #content (needs fontTools, falls back to the full font)
+SUBSET_FONTS = True
+
+# "files" writes each render as loose dumps_full/{code}/pdf|html files. "shards"
+# packs them into size-capped tar shards in SHARD_DIR with a (lang, title) ->
+# (shard, offset, length) index, see shard_writer.py.
+OUTPUT_FORMAT = "files"
+SHARD_DIR = "dumps_full/shards"
+MAX_SHARD_BYTES = 1024 * 1024 * 1024
+
+# "compact" saves only the #content subtree and the skin stylesheet links, with
+# the font as an ID under fonts/ and the layout (page size, columns, font size)
+# as parameters in a <meta name="wiki-render"> tag (see html_snapshot.py), so
+# it still re-renders offline from OFFLINE_HTML_DIRS. "full" saves
+# page.content(), chrome and base64 font included.
+HTML_SNAPSHOT = "compact"
+
+# Write PDFs through a DevTools stream in chunks instead of one base64 blob,
+# so long list articles do not spike memory in Chromium and Python
+STREAM_PDF = True
+
+# Per-article timeouts (seconds) and retries. Articles that still fail are
+# appended to SKIP_LEDGER_PATH; set RETRY_FAILED_ONLY to re-run just those.
+NAVIGATION_TIMEOUT = 60
+PRINT_TIMEOUT = 120
+FONT_LOAD_TIMEOUT = 30
+MAX_ATTEMPTS = 3
+RETRY_BASE_DELAY = 2
+RETRY_MAX_DELAY = 60
+SKIP_LEDGER_PATH = "dumps_full/skipped_pages.jsonl"
+RETRY_FAILED_ONLY = False
+
+# Finished jobs are recorded here, so a restarted run skips them. "size" checks
+# output sizes and PDF end markers, "full" also re-hashes every output.
+MANIFEST_PATH = "dumps_full/manifest.jsonl"
+# Skip renders whose normalised article content (plus render settings) was
+# rendered before: unchanged articles keep their outputs, redirects and other
+# duplicates link to them. None disables the content store.
+CONTENT_STORE_PATH = "dumps_full/content_store.sqlite"
+# Reload titles the manifest already has and re-render only those whose content
+# changed (needs the content store), e.g. after the wiki has been edited
+REFRESH_RENDERS = False
+# One line per render with its layout, font, page count, sizes and hashes
+RENDER_INDEX_PATH = "dumps_full/render_index.jsonl"
+
+# master.csv mode (--master): one line per finished row, recording which of its
+# languages were rendered. Rows with every language done are skipped on restart.
+MASTER_ROWS_PATH = "dumps_full/master_rows.jsonl"
+VERIFY_OUTPUTS = "size"
+
+# With --queue, jobs are leased from a shared SQLite work queue (see
+# work_queue.py) instead of read from the dump. Leases not renewed within this
+# many seconds are handed to other workers.
+QUEUE_LEASE_SECONDS = 300
+
+# Layout variants rendered from each page load (page size, columns, font size, font)
+NUM_VARIANTS = 1
+
+# Serve skin CSS / JS / logos / shared images from a local disk cache
+USE_RESOURCE_CACHE = True
+RESOURCE_CACHE_DIR = "resource_cache"
+RESOURCE_CACHE_BYTES = 2 * 1024 * 1024 * 1024
+
+# Abort analytics, banners, scripts and other requests the print layout does
+# not need, so networkidle0 is reached sooner. See request_filter.py for the rule format.
+REQUEST_FILTER_RULES = DEFAULT_RULES
+
+# "live" navigates to each article. "offline" renders stored article HTML with
+# setContent (page chrome and scripts stripped) and never touches the network:
+# assets resolve against OFFLINE_ASSET_BASE and are served from the resource
+# cache, anything not cached is aborted.
+RENDER_SOURCE = "live"
+OFFLINE_HTML_DIRS = HTML_STORE_DIRS
+OFFLINE_ASSET_BASE = "https://{code}.wikipedia.org/wiki/"
+
+# Dispatch each window of this many dump titles longest article first, so giant
+# list articles start early instead of straggling at the end. Sizes are wikitext
+# lengths from `python job_sizes.py <dump> --lang <code>`, or estimated from
+# stored HTML (see job_sizes.estimated_length). 0 keeps dump order.
+SCHEDULE_WINDOW = 2000
+
 file_path = f"{dumps_folder}/{lang_to_use}wiki-latest-all-titles-in-ns0.txt"
-count = 0
 
-with open(file_path, 'r', encoding = 'utf-8') as file:
-    for line in file:
-        count += 1
-        if count == 1:
-            continue
-        url = line[:-2]
-        output_filename = url.split('/')[-1][:-2]
-        code = lang_to_use
-        # Run the asynchronous function
-        asyncio.get_event_loop().run_until_complete(
-            save_wikipedia_article_as_pdf(url, output_filename, code, chrome_path, user_agent)
-        )
-        time.sleep(0.5)
 
+def iter_dump_jobs(file_path, code, shard_index=0, num_shards=1, strided=False):
+    """
+    Yields (url, output_filename, code) for the titles of one shard of a dump.
+    The dump's byte-offset index lets each worker seek straight to its shard.
+    With SCHEDULE_WINDOW set, each window of titles is dispatched largest
+    first, sized by the wikitext lengths in `<dump>.sizes` (see job_sizes.py),
+    or for titles without one, a wikitext length estimated from the stored HTML.
+    """
+    sizes = load_sizes(file_path) if SCHEDULE_WINDOW else None
+    search_dirs = [d.format(code=code) for d in OFFLINE_HTML_DIRS]
+
+    def sized_jobs():
+        for n, line in iter_shard(file_path, shard_index, num_shards, strided):
+            if not line:
+                continue
+            url, output_filename = parse_dump_line(line, code)
+            size = None
+            if SCHEDULE_WINDOW:
+                if sizes is not None and sizes[n] != UNKNOWN_SIZE:
+                    size = sizes[n]
+                else:
+                    size = estimated_length(output_filename, search_dirs)
+            yield size, (url, output_filename, code)
+
+    if not SCHEDULE_WINDOW:
+        yield from (job for _, job in sized_jobs())
+        return
+    yield from longest_first(sized_jobs(), SCHEDULE_WINDOW)
+
+
+async def setup_tab(page):
+    """Installs the request handlers on every new tab of the pool."""
+    handlers = []
+    if request_filter is not None:
+        handlers.append(request_filter.handle_request)
+    if resource_cache is not None:
+        handlers.append(resource_cache.attach(page))
+    if RENDER_SOURCE == "offline":
+        handlers.append(abort_request)
+    if handlers:
+        await install_request_handlers(page, handlers)
+
+
+def open_run(shard_index=0, num_shards=1):
+    """
+    Creates the shared render state (limiters, font registry, caches, skip
+    ledger, run manifest) and returns a browser pool ready to be started.
+    Used by main() and by pipeline.py.
+    """
+    global font_registry, resource_cache, request_filter, skip_ledger, run_manifest
+    global rate_limiter, nav_limiter, shard_writer, render_index, content_store
+    rate_limiter = RateLimiter(state_dir=RATE_LIMIT_DIR)
+    font_registry = FontRegistry(lang_code_mapping.values(), max_cache_bytes=FONT_CSS_CACHE_BYTES,
+                                 max_subset_cache_bytes=FONT_SUBSET_CACHE_BYTES, subset_workers=FONT_SUBSET_WORKERS)
+    print("Font registry :", font_registry.stats())
+    if USE_RESOURCE_CACHE:
+        resource_cache = ResourceCache(RESOURCE_CACHE_DIR, max_bytes=RESOURCE_CACHE_BYTES)
+    if REQUEST_FILTER_RULES:
+        request_filter = RequestFilter(REQUEST_FILTER_RULES)
+    pool = BrowserPool(chrome_path, user_agent, num_browsers=NUM_BROWSERS, tabs_per_browser=TABS_PER_BROWSER,
+                       tab_setup=setup_tab, max_pages_per_browser=MAX_PAGES_PER_BROWSER,
+                       max_rss_mb=MAX_BROWSER_RSS_MB, max_latency=MAX_MEAN_LATENCY)
+    nav_limiter = AdaptiveLimiter(initial=min(NAV_CONCURRENCY, pool.capacity), max_limit=pool.capacity,
+                                  latency_target=NAV_LATENCY_TARGET, name="navigation")
+    skip_ledger = SkipLedger(SKIP_LEDGER_PATH, shard_index, num_shards)
+    run_manifest = RunManifest(MANIFEST_PATH, verify=VERIFY_OUTPUTS, shard_index=shard_index, num_shards=num_shards)
+    print(f"Run manifest : {len(run_manifest)} jobs already done")
+    render_index = RenderIndex(RENDER_INDEX_PATH, shard_index, num_shards)
+    if CONTENT_STORE_PATH:
+        content_store = ContentStore(CONTENT_STORE_PATH)
+    if OUTPUT_FORMAT == "shards":
+        shard_writer = ShardWriter(SHARD_DIR, f"w{shard_index}of{num_shards}", MAX_SHARD_BYTES)
+    return pool
+
+
+def close_run():
+    """Prints the run's statistics and closes what open_run() opened."""
+    print("Navigation concurrency :", nav_limiter.metrics())
+    if resource_cache is not None:
+        print("Resource cache :", resource_cache.stats())
+        resource_cache.close()
+    if request_filter is not None:
+        print("Request filter hits :", request_filter.stats())
+    if shard_writer is not None:
+        shard_writer.close()
+    if content_store is not None:
+        print("Content store :", content_store.stats())
+        content_store.close()
+    print("Font registry :", font_registry.stats())
+    font_registry.close()
+    render_index.close()
+    skip_ledger.close()
+    run_manifest.close()
+
+
+async def main(shard_index=0, num_shards=1, strided=False, queue_path=None, master_path=None):
+    global work_queue, worker_id
+    pool = open_run(shard_index, num_shards)
+    if master_path is not None:
+        async with pool:
+            await render_master(pool, master_path, MASTER_ROWS_PATH)
+            print("Browser pool :", pool.stats())
+        close_run()
+        return
+    job_fn = render_job
+    on_give_up = None
+    heartbeat = None
+    if queue_path is not None:
+        work_queue = WorkQueue(queue_path, lease_seconds=QUEUE_LEASE_SECONDS)
+        worker_id = default_worker_id()
+        print(f"Worker {worker_id} pulling from {queue_path} : {work_queue.counts()}")
+        jobs = iter_queue_jobs(pool.capacity)
+        job_fn = queue_job
+        on_give_up = queue_job_given_up
+        heartbeat = asyncio.ensure_future(heartbeat_loop())
+    elif RETRY_FAILED_ONLY:
+        failed = load_failed(SKIP_LEDGER_PATH)[shard_index::num_shards]
+        jobs = [(entry['url'], entry['title'], entry['lang']) for entry in failed]
+        print(f"Retrying {len(jobs)} failed pages from {SKIP_LEDGER_PATH}")
+    else:
+        jobs = iter_dump_jobs(file_path, lang_to_use, shard_index, num_shards, strided)
+    async with pool:
+        await pool.map(job_fn, jobs, on_give_up=on_give_up)
+        print("Browser pool :", pool.stats())
+    if heartbeat is not None:
+        heartbeat.cancel()
+        print("Work queue :", work_queue.counts())
+        work_queue.close()
+    close_run()
+
+
+def run_shard(shard_index, num_shards, strided, queue_path=None, master_path=None):
+    asyncio.get_event_loop().run_until_complete(main(shard_index, num_shards, strided, queue_path, master_path))
+    print(f"Shard {shard_index} skipped pages :", skipped_pages)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render a Wikipedia title dump to PDF and HTML.")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Start this many worker processes, one per shard of the dump.")
+    parser.add_argument('--shard', type=int, default=None,
+                        help="Render only this shard (e.g. on one machine, or to restart a shard).")
+    parser.add_argument('--num-shards', type=int, default=None, help="Total shards when --shard is given.")
+    parser.add_argument('--strided', action='store_true',
+                        help="Give each shard every Nth title instead of a contiguous block.")
+    parser.add_argument('--queue', default=None,
+                        help="Pull jobs from this SQLite work queue instead of the dump (fill it with work_queue.py).")
+    parser.add_argument('--master', default=None,
+                        help="Render this master.csv, all languages of a row at once, instead of the dump.")
+    args = parser.parse_args()
+
+    if args.master is not None:
+        # One process; the pool already renders a row's languages in parallel
+        shards = [(0, 1, False, None, args.master)]
+    elif args.queue is not None:
+        # Queue workers share one job table, so every process just leases from it
+        shards = [(i, args.workers, False, args.queue) for i in range(args.workers)]
+    elif args.shard is not None:
+        shards = [(args.shard, args.num_shards or args.workers, args.strided)]
+    else:
+        shards = [(i, args.workers, args.strided) for i in range(args.workers)]
+
+    if args.queue is None and args.master is None:
+        # Build the offset index once up front instead of racing in every worker
+        load_index(file_path)
 
-print("Skipped pages :", skipped_pages)
\ No newline at end of file
+    if len(shards) == 1:
+        run_shard(*shards[0])
+    else:
+        workers = [multiprocessing.Process(target=run_shard, args=shard) for shard in shards]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
@@ -0,0 +1,97 @@
+import asyncio
+import os
+from bs4 import BeautifulSoup
+
+# Where stored article HTML is kept, per language code: downloaded pages and
+# dump articles, then the snapshots saved next to each render
+HTML_STORE_DIRS = ["html_files/{code}", "dumps_full/{code}/html"]
+
+# Page chrome around the article that never matters for the printed layout
+CHROME_SELECTORS = [
+    '#mw-navigation', '#mw-panel', '#mw-head', '#mw-page-base', '#mw-head-base',
+    '.vector-header-container', '.vector-main-menu-container', '.vector-column-start',
+    '.vector-column-end', '.vector-page-toolbar', '.vector-sticky-header', '#vector-toc',
+    '.vector-dropdown', '.mw-jump-link', '#siteNotice', '#centralNotice', '#footer',
+    '.mw-footer', '.mw-footer-container', '#p-lang-btn', '.mw-portlet-lang', '.printfooter',
+]
+
+# Waits until fonts and images of a setContent() document have loaded
+WAIT_FOR_ASSETS_JS = """
+async () => {
+    await document.fonts.ready;
+    await Promise.all(Array.from(document.images)
+        .filter(img => !img.complete)
+        .map(img => new Promise(resolve => { img.onload = img.onerror = resolve; })));
+    return true;
+}
+"""
+
+
+def strip_page_chrome(html, base_href):
+    """
+    Reduces a saved Wikipedia page to what the print layout needs: scripts,
+    navigation, sidebars and footers are removed, along with any style tag a
+    previous render injected, and a <base> is added so relative asset URLs
+    resolve against `base_href`.
+
+    Args:
+        html (str): Full HTML of a saved article.
+        base_href (str): Base URL for relative links (site root or a local asset mirror).
+
+    Returns:
+        str: The cleaned HTML, ready for page.setContent().
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+
+    for tag in soup.find_all(['script', 'noscript']):
+        tag.decompose()
+    for link in soup.find_all('link'):
+        if 'stylesheet' not in (link.get('rel') or []):
+            link.decompose()
+    for selector in CHROME_SELECTORS:
+        for tag in soup.select(selector):
+            tag.decompose()
+    # Layout CSS injected by an earlier render (carries the inlined font)
+    for style in soup.find_all('style'):
+        if 'CustomFont' in (style.string or ''):
+            style.decompose()
+    # Lazy images would never load in a page that is not scrolled
+    for img in soup.find_all('img', loading=True):
+        del img['loading']
+
+    if soup.head is None:
+        soup.html.insert(0, soup.new_tag('head'))
+    for base in soup.head.find_all('base'):
+        base.decompose()
+    soup.head.insert(0, soup.new_tag('base', href=base_href))
+    return str(soup)
+
+
+def find_cached_html(output_filename, search_dirs):
+    """
+    Returns the path of the first `<dir>/<output_filename>.html` that exists,
+    or None.
+    """
+    for directory in search_dirs:
+        path = os.path.join(directory, f"{output_filename}.html")
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+async def set_offline_content(page, html, base_href, timeout=30):
+    """
+    Loads a cleaned article into `page` with setContent and waits for its
+    fonts and images.
+
+    Args:
+        page (pyppeteer.page.Page): The tab to load into.
+        html (str): Raw saved HTML of the article.
+        base_href (str): Base URL used to resolve its assets.
+        timeout (float): Seconds to wait for assets before printing anyway.
+    """
+    await page.setContent(strip_page_chrome(html, base_href))
+    try:
+        await asyncio.wait_for(page.evaluate(WAIT_FOR_ASSETS_JS), timeout)
+    except asyncio.TimeoutError:
+        print("Timed out waiting for assets, rendering what has loaded")
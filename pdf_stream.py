@@ -0,0 +1,87 @@
+import base64
+import os
+from pyppeteer.page import convertPrintParameterToInches
+
+# Bytes requested per IO.read call. Only this much PDF (plus its base64 form)
+# is held in memory at once, however long the article is.
+CHUNK_SIZE = 1024 * 1024
+
+
+def print_to_pdf_params(options):
+    """
+    Converts page.pdf()-style options (px / mm / in strings) into
+    Page.printToPDF parameters, asking Chromium to return a stream handle
+    instead of the whole document.
+    """
+    margin = options.get('margin', {})
+    return {
+        'landscape': bool(options.get('landscape')),
+        'displayHeaderFooter': bool(options.get('displayHeaderFooter')),
+        'headerTemplate': options.get('headerTemplate', ''),
+        'footerTemplate': options.get('footerTemplate', ''),
+        'printBackground': bool(options.get('printBackground')),
+        'scale': options.get('scale', 1),
+        'paperWidth': convertPrintParameterToInches(options.get('width')) or 8.5,
+        'paperHeight': convertPrintParameterToInches(options.get('height')) or 11.0,
+        'marginTop': convertPrintParameterToInches(margin.get('top')) or 0,
+        'marginBottom': convertPrintParameterToInches(margin.get('bottom')) or 0,
+        'marginLeft': convertPrintParameterToInches(margin.get('left')) or 0,
+        'marginRight': convertPrintParameterToInches(margin.get('right')) or 0,
+        'pageRanges': options.get('pageRanges', ''),
+        'preferCSSPageSize': options.get('preferCSSPageSize', False),
+        'transferMode': 'ReturnAsStream',
+    }
+
+
+async def stream_pdf(page, sink, options, chunk_size=CHUNK_SIZE):
+    """
+    Prints `page` to PDF through a DevTools stream and writes it chunk by
+    chunk, instead of receiving the whole base64 document at once as
+    page.pdf() does.
+
+    Args:
+        page (pyppeteer.page.Page): The tab to print.
+        sink (str | file-like): Output path, or any object with a binary
+            write() (e.g. io.BytesIO). Paths are written to a temp file and
+            renamed once complete, so a crash never leaves a truncated PDF.
+        options (dict): The same options page.pdf() takes (`path` is ignored).
+        chunk_size (int): Bytes requested per IO.read.
+
+    Returns:
+        int: Number of bytes written.
+    """
+    client = page._client
+    result = await client.send('Page.printToPDF', print_to_pdf_params(options))
+    handle = result['stream']
+
+    if isinstance(sink, str):
+        tmp_path = f"{sink}.part"
+        out = open(tmp_path, 'wb')
+    else:
+        tmp_path = None
+        out = sink
+
+    written = 0
+    complete = False
+    try:
+        while True:
+            chunk = await client.send('IO.read', {'handle': handle, 'size': chunk_size})
+            data = chunk.get('data', '')
+            if chunk.get('base64Encoded'):
+                data = base64.b64decode(data)
+            else:
+                data = data.encode('latin-1')
+            out.write(data)
+            written += len(data)
+            if chunk.get('eof'):
+                complete = True
+                break
+    finally:
+        await client.send('IO.close', {'handle': handle})
+        if tmp_path is not None:
+            out.close()
+            if complete:
+                os.replace(tmp_path, sink)
+            else:
+                os.remove(tmp_path)
+    return written
@@ -0,0 +1,146 @@
+import re
+import fitz
+from markdownify import markdownify
+from html_snapshot import read_render_info
+from render_sidecar import read_sidecar
+
+# Blocks wider than this share of the page are read as full-width (tables,
+# headings spanning the columns) rather than as part of a column
+TABLE_WIDTH_RATIO = 0.8
+
+
+def extract_content_with_hardcoded_tables(page, num_columns, table_width_ratio) -> str:
+    """
+    Extracts text from a page with both multi-column layouts and full-width tables
+    using a hardcoded width threshold to detect tables.
+
+    Args:
+        page (fitz.Page): The PyMuPDF page object.
+        num_columns (int): The number of columns on the page.
+        table_width_ratio (float): The ratio of page width that a block must exceed to be considered a table.
+                                  A value of 0.8 means any block wider than 80% of the page is a table.
+
+    Returns:
+        str: The extracted text in the correct reading order.
+    """
+    page_rect = page.rect
+    page_width = page_rect.width
+    table_threshold = page_width * table_width_ratio
+
+    full_text = ""
+    
+    # Get all text blocks and sort them vertically
+    blocks = page.get_text("blocks")
+    blocks.sort(key=lambda b: (b[1], b[0])) # Sort by y0 then x0 for a natural read flow
+
+    column_blocks = []
+    
+    for block in blocks:
+        block_rect = fitz.Rect(block[:4])
+        block_text = block[4]
+        
+        # If the block is wide, it is likely a table or a heading spanning multiple columns.
+        if block_rect.width > table_threshold:
+            # Process any pending column blocks first, then the wide block
+            if column_blocks:
+                column_blocks.sort(key=lambda b: b[0])
+                for col_b in column_blocks:
+                    full_text += col_b[4]
+                full_text += "\n"
+                column_blocks = []
+            
+            full_text += block_text + "\n"
+        else:
+            # It's a column block, add it to a list for horizontal sorting
+            column_blocks.append(block)
+    
+    # Process any remaining column blocks at the end
+    if column_blocks:
+        column_blocks.sort(key=lambda b: b[0])
+        for col_b in column_blocks:
+            full_text += col_b[4]
+    
+    return full_text
+
+
+def extract_sorted_columns(page, num_columns):
+    """
+    Extracts text from a page with multiple columns in the correct reading order.
+
+    Args:
+        page (fitz.Page): The PyMuPDF page object.
+        num_columns (int): The number of columns on the page.
+
+    Returns:
+        str: The extracted text in the correct reading order.
+    """
+    # Get the bounding box of the page
+    page_rect = page.rect
+    total_width = page_rect.width
+    column_width = total_width / num_columns
+
+    full_text = ""
+    # Process each column strip from left to right
+    for i in range(num_columns):
+        # Define the bounding box for the current column
+        column_rect = fitz.Rect(
+            page_rect.x0 + i * column_width,
+            page_rect.y0,
+            page_rect.x0 + (i + 1) * column_width,
+            page_rect.y1,
+        )
+
+        # Extract text from the column's bounding box, sorting it
+        column_text = page.get_text(
+            "text", clip=column_rect, sort=True
+        )
+
+        # Append the extracted text to the full text
+        full_text += column_text + "\n"
+
+    return full_text
+
+
+def column_count(html_doc):
+    """
+    Column count of a rendered article, read from a compact snapshot's render
+    info or else from the layout CSS injected at render time.
+    """
+    render_info = read_render_info(html_doc)
+    if render_info is not None:
+        return render_info['layout']['columns']
+    match = re.search(r'column-count:\s*(\d+);', html_doc)
+    if match:
+        return int(match.group(1))
+    return 1
+
+
+def extract_pdf_pages(pdf_path, num_columns, table_width_ratio=TABLE_WIDTH_RATIO):
+    """
+    Extracts the text of every page of a rendered PDF in reading order.
+
+    Returns:
+        list: One string per page.
+    """
+    with fitz.open(pdf_path) as doc:
+        return [extract_content_with_hardcoded_tables(page, num_columns, table_width_ratio) for page in doc]
+
+
+def extract_article(pdf_path, html_path):
+    """
+    Extracts one rendered article: the PDF's page texts and the markdown of
+    its saved HTML. A plain function of file paths returning plain data, so it
+    can run in a process pool.
+
+    Returns:
+        dict: 'pages' (list of page texts), 'markdown' (str) and 'columns' (int).
+    """
+    with open(html_path, 'r', encoding='utf-8') as f:
+        html_doc = f.read()
+    sidecar = read_sidecar(pdf_path)
+    num_columns = sidecar['layout']['columns'] if sidecar else column_count(html_doc)
+    return {
+        'pages': extract_pdf_pages(pdf_path, num_columns),
+        'markdown': markdownify(html_doc, strip=['a', 'img']),
+        'columns': num_columns,
+    }
@@ -0,0 +1,277 @@
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import requests
+import main_scaled
+from adaptive_concurrency import THROTTLE_STATUSES, AdaptiveLimiter
+from offline_html import find_cached_html
+from pdf_text import extract_article
+from plan_jobs import iter_plan
+from skip_ledger import backoff_delay
+from work_queue import jobs_from_master
+
+# Items each queue between two stages may hold. A full queue makes the stage
+# before it wait, so a slow stage holds back the rest instead of piling work up in memory.
+QUEUE_SIZE = 16
+
+# Fetch stage: download each article's HTML and hand it to the render stage,
+# so browser tabs never wait on the wiki for the document. Subresources still
+# go through the request filter and resource cache, and cache misses go to the
+# network. False leaves loading to main_scaled.RENDER_SOURCE.
+FETCH_HTML = True
+FETCH_WORKERS = 8
+
+# Extract stage: PDF text extraction and HTML -> markdown run in this many processes
+EXTRACT_PROCESSES = os.cpu_count() or 2
+
+OUTPUT_DIR = "dumps_full"
+
+# Seconds between queue depth reports
+REPORT_EVERY = 30
+
+# Marks the end of a queue
+DONE = None
+
+
+class StageStats:
+    """Per-stage counters printed with the queue depths."""
+
+    def __init__(self):
+        self.done = 0
+        self.skipped = 0
+        self.failed = 0
+        self.busy = 0
+
+    def __repr__(self):
+        return f"done={self.done} skipped={self.skipped} failed={self.failed} busy={self.busy}"
+
+
+async def run_stage(name, handle, inbox, outbox, workers, stats):
+    """
+    Runs `workers` copies of a stage. Each takes an item from `inbox`, awaits
+    `handle(item)` and puts every item of the returned list on `outbox`. An
+    empty list counts as skipped, an exception as failed. When the inbox is
+    finished the stage closes its outbox.
+    """
+    async def worker():
+        while True:
+            item = await inbox.get()
+            if item is DONE:
+                # Leave the marker for the stage's other workers
+                await inbox.put(DONE)
+                return
+            stats.busy += 1
+            try:
+                results = await handle(item)
+            except Exception as e:
+                print(f"[{name}] failed for {item}: {type(e).__name__}: {e}")
+                stats.failed += 1
+                continue
+            finally:
+                stats.busy -= 1
+            if results:
+                stats.done += 1
+            else:
+                stats.skipped += 1
+            if outbox is not None:
+                for result in results:
+                    await outbox.put(result)
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    if outbox is not None:
+        await outbox.put(DONE)
+
+
+def download_html(url, output_filename, code, limiter):
+    """
+    Downloads one article's HTML to where offline rendering looks for it and
+    returns its path. Runs in a thread.
+    """
+    html_dir = main_scaled.OFFLINE_HTML_DIRS[0].format(code=code)
+    os.makedirs(html_dir, exist_ok=True)
+    with limiter.slot():
+        main_scaled.rate_limiter.acquire(url)
+        started = time.monotonic()
+        try:
+            response = requests.get(url, headers={'User-Agent': main_scaled.user_agent}, timeout=30)
+        except requests.exceptions.RequestException:
+            limiter.record(time.monotonic() - started, error=True)
+            raise
+        limiter.record_response(response, time.monotonic() - started)
+    response.raise_for_status()
+    path = os.path.join(html_dir, f"{output_filename}.html")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(response.text)
+    return path
+
+
+def fetch_retryable(error):
+    """True for fetch errors worth retrying: timeouts, dropped connections, throttling and server errors."""
+    if isinstance(error, requests.exceptions.HTTPError):
+        status = error.response.status_code if error.response is not None else None
+        return status in THROTTLE_STATUSES or (status is not None and status >= 500)
+    return isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError))
+
+
+async def fetch_html(url, output_filename, code, limiter):
+    """
+    Downloads an article's HTML with the same retry policy as render_job:
+    throttling, server errors and timeouts back off with jitter and are
+    retried up to main_scaled.MAX_ATTEMPTS times. A fetch that still fails,
+    or fails in a way retrying cannot fix (e.g. a 404), is written to the
+    skip ledger so a RETRY_FAILED_ONLY run picks it up again.
+
+    Returns:
+        str: Path of the stored HTML, or None if the article was given up on.
+    """
+    loop = asyncio.get_event_loop()
+    started = time.monotonic()
+    for attempt in range(1, main_scaled.MAX_ATTEMPTS + 1):
+        try:
+            return await loop.run_in_executor(None, download_html, url, output_filename, code, limiter)
+        except Exception as e:
+            if attempt == main_scaled.MAX_ATTEMPTS or not fetch_retryable(e):
+                print(f"Skipping {output_filename}, fetch failed after {attempt} attempt(s): {type(e).__name__}: {e}")
+                main_scaled.skip_ledger.record_failure(code, output_filename, url, e, attempt, time.monotonic() - started)
+                return None
+            delay = backoff_delay(attempt, main_scaled.RETRY_BASE_DELAY, main_scaled.RETRY_MAX_DELAY)
+            print(f"Fetch attempt {attempt} failed for {output_filename} ({type(e).__name__}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+def rendered_outputs(code, output_filename):
+    """(pdf_path, html_path) of every variant the run manifest has for a job."""
+    entry = main_scaled.run_manifest.done.get((code, output_filename))
+    if entry is None:
+        return []
+    paths = [output['path'] for output in entry['outputs']]
+    pdfs = [p for p in paths if p.endswith('.pdf')]
+    htmls = [p for p in paths if p.endswith('.html')]
+    return list(zip(pdfs, htmls))
+
+
+def markdown_paths(code, pdf_path):
+    name = os.path.splitext(os.path.basename(pdf_path))[0]
+    return f"{OUTPUT_DIR}/{code}/md/{name}.md", f"{OUTPUT_DIR}/{code}/text/{name}"
+
+
+async def report(queues, stats):
+    """Prints every stage's queue depth and counters until cancelled."""
+    while True:
+        await asyncio.sleep(REPORT_EVERY)
+        depths = ", ".join(f"{name}: {queue.qsize()}/{queue.maxsize}" for name, queue in queues.items())
+        print(f"Queue depths : {depths}")
+        for name, stage_stats in stats.items():
+            print(f"  {name} : {stage_stats}")
+
+
+async def run_pipeline(jobs):
+    """
+    Fetches, renders, extracts and writes markdown for `jobs` with all four
+    stages running at once:
+
+        fetch (threads) -> render (browser pool) -> extract (processes) -> write
+
+    Args:
+        jobs (iterable): (url, output_filename, code) tuples, as main_scaled takes them.
+    """
+    loop = asyncio.get_event_loop()
+    # The extract stage reads the rendered PDF and HTML from disk
+    main_scaled.OUTPUT_FORMAT = "files"
+    pool = main_scaled.open_run()
+    fetch_limiter = AdaptiveLimiter(initial=2, max_limit=FETCH_WORKERS, latency_target=10, name="fetch")
+    processes = ProcessPoolExecutor(EXTRACT_PROCESSES)
+
+    async def fetch(job):
+        url, output_filename, code = job
+        html_path = None
+        if FETCH_HTML and not main_scaled.run_manifest.is_done(code, output_filename):
+            search_dirs = [d.format(code=code) for d in main_scaled.OFFLINE_HTML_DIRS]
+            html_path = find_cached_html(output_filename, search_dirs)
+            if html_path is None:
+                html_path = await fetch_html(url, output_filename, code, fetch_limiter)
+                if html_path is None:
+                    # Recorded in the skip ledger
+                    return []
+        return [(url, output_filename, code, html_path)]
+
+    async def render_on_tab(page, url, output_filename, code, html_path):
+        # The tab stays in live mode: the document comes from the fetched
+        # copy, and its stylesheets and images from the cache or the network
+        html = None
+        if html_path is not None:
+            with open(html_path, 'r', encoding='utf-8') as f:
+                html = f.read()
+        error = await main_scaled.render_job(page, url, output_filename, code, html=html)
+        if error is not None:
+            return []
+        return [(code, pdf_path, html_path) for pdf_path, html_path in rendered_outputs(code, output_filename)]
+
+    async def render(job):
+        task = await pool.submit(render_on_tab, *job)
+        return await task or []
+
+    async def extract(item):
+        code, pdf_path, html_path = item
+        if os.path.exists(markdown_paths(code, pdf_path)[0]):
+            return []
+        result = await loop.run_in_executor(processes, extract_article, pdf_path, html_path)
+        return [(code, pdf_path, result)]
+
+    async def write(item):
+        code, pdf_path, result = item
+        md_path, text_dir = markdown_paths(code, pdf_path)
+        os.makedirs(text_dir, exist_ok=True)
+        for n, text in enumerate(result['pages'], 1):
+            with open(f"{text_dir}/page_{n}.txt", 'w', encoding='utf-8') as f:
+                f.write(text)
+        os.makedirs(os.path.dirname(md_path), exist_ok=True)
+        # Written last, so its presence means the article's extraction is complete
+        with open(md_path, 'w', encoding='utf-8') as f:
+            f.write(result['markdown'])
+        print(f"Extracted {len(result['pages'])} pages of {pdf_path}")
+        return [md_path]
+
+    queues = {name: asyncio.Queue(QUEUE_SIZE) for name in ("fetch", "render", "extract", "write")}
+    stats = {name: StageStats() for name in queues}
+
+    async def feed():
+        for job in jobs:
+            await queues["fetch"].put(job)
+        await queues["fetch"].put(DONE)
+
+    reporter = asyncio.ensure_future(report(queues, stats))
+    async with pool:
+        await asyncio.gather(
+            feed(),
+            run_stage("fetch", fetch, queues["fetch"], queues["render"], FETCH_WORKERS, stats["fetch"]),
+            run_stage("render", render, queues["render"], queues["extract"], pool.capacity, stats["render"]),
+            run_stage("extract", extract, queues["extract"], queues["write"], EXTRACT_PROCESSES, stats["extract"]),
+            run_stage("write", write, queues["write"], None, 1, stats["write"]),
+        )
+        print("Browser pool :", pool.stats())
+    reporter.cancel()
+    processes.shutdown()
+    print("Fetch concurrency :", fetch_limiter.metrics())
+    for name, stage_stats in stats.items():
+        print(f"{name} : {stage_stats}")
+    main_scaled.close_run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch, render, extract and convert articles in one pipelined run.")
+    parser.add_argument('--dump', help="Title dump to process (defaults to main_scaled.file_path).")
+    parser.add_argument('--lang', default=main_scaled.lang_to_use, help="Language code of --dump.")
+    parser.add_argument('--master', help="Process every language link of this master.csv instead of a dump.")
+    parser.add_argument('--plan', help="Process the jobs of a plan written by plan_jobs.py instead of a dump.")
+    args = parser.parse_args()
+
+    if args.plan:
+        jobs = ((url, title, lang) for lang, title, url, _, _ in iter_plan(args.plan))
+    elif args.master:
+        jobs = ((url, title, lang) for lang, title, url, _ in jobs_from_master(args.master))
+    else:
+        jobs = main_scaled.iter_dump_jobs(args.dump or main_scaled.file_path, args.lang)
+    asyncio.get_event_loop().run_until_complete(run_pipeline(jobs))
@@ -0,0 +1,145 @@
+import csv
+import gzip
+from urllib.parse import quote, unquote, urlsplit
+import pandas as pd
+import requests
+from job_sizes import API_BATCH, estimated_length, fetch_page_lengths
+from offline_html import HTML_STORE_DIRS
+from rate_limiter import RateLimiter
+
+lang_codes = ["as", "bn", "gu", "hi", "kn", "ml", "mr", "or", "ta", "te"]
+
+PLAN_COLUMNS = ['lang', 'title', 'url', 'domain', 'keyword', 'size']
+
+
+def normalize_url(url):
+    """
+    Canonical form of a Wikipedia article URL, so the same page reached
+    through different spellings dedupes: https, desktop host, no query or
+    fragment, underscores for spaces, and one consistent percent-encoding.
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().replace('.m.wikipedia.org', '.wikipedia.org')
+    title = unquote(parts.path.split('/wiki/', 1)[-1]).replace(' ', '_')
+    return f"https://{host}/wiki/{quote(title, safe='')}"
+
+
+def master_title(keyword, code):
+    """Output name of a master.csv keyword's article in one language."""
+    return keyword.replace(' ', '_').replace('/', '_') + f"_{code}"
+
+
+def melt_master(csv_path="master.csv"):
+    """
+    master.csv's wide `{code}_wiki_link` columns as long (row, lang, url,
+    domain, keyword, title) rows, language by language; `row` is the row's
+    index in master.csv.
+    """
+    df = pd.read_csv(csv_path)
+    df['row'] = df.index
+    link_columns = [f"{code}_wiki_link" for code in lang_codes if f"{code}_wiki_link" in df.columns]
+    long = df.melt(id_vars=['row', 'Domain', 'Keyword'], value_vars=link_columns, var_name='lang', value_name='url')
+    long = long.dropna(subset=['url'])
+    long['lang'] = long['lang'].str[:-len('_wiki_link')]
+    long['title'] = [master_title(keyword, code) for keyword, code in zip(long['Keyword'], long['lang'])]
+    return long.rename(columns={'Domain': 'domain', 'Keyword': 'keyword'})
+
+
+def melt_links(csv_path="master_links.csv"):
+    """master_links.csv's (language, link) rows in the same shape; titles come from the URL."""
+    df = pd.read_csv(csv_path).dropna(subset=['link'])
+    long = pd.DataFrame({'lang': df['language'], 'url': df['link'], 'domain': None, 'keyword': None})
+    long['title'] = long['url'].map(lambda url: unquote(url.split('/wiki/', 1)[-1]).replace('/', '_'))
+    return long
+
+
+def estimate_sizes(plan, use_api=False):
+    """
+    Size estimate per job as a wikitext length, the unit `<dump>.sizes` and
+    the work queue use. With `use_api` every job is looked up from the
+    MediaWiki API; jobs it has no length for, or all jobs without `use_api`,
+    get an estimate from their stored HTML. Unknown sizes are left empty.
+    """
+    sizes = pd.Series(
+        [estimated_length(title, [d.format(code=lang) for d in HTML_STORE_DIRS]) for lang, title in zip(plan['lang'], plan['title'])],
+        index=plan.index, dtype='Int64'
+    )
+    if use_api:
+        session = requests.Session()
+        session.headers['User-Agent'] = "wiki-pdf-job-planner"
+        rate_limiter = RateLimiter()
+        for lang, group in plan.groupby('lang'):
+            titles = group['url'].map(lambda url: unquote(url.split('/wiki/', 1)[-1]))
+            for start in range(0, len(titles), API_BATCH):
+                batch = titles.iloc[start:start + API_BATCH]
+                try:
+                    lengths = fetch_page_lengths(lang, list(batch), session, rate_limiter)
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    print(f"Size lookup failed for {lang}: {e}")
+                    continue
+                found = batch.map(lengths).dropna()
+                sizes[found.index] = found.astype('Int64')
+    return sizes
+
+
+def dedupe_jobs(jobs):
+    """
+    Drops jobs whose normalised URL is already in the table, then any that
+    would reuse an output name in the same language. Earlier rows win.
+    """
+    jobs = jobs.copy()
+    jobs['url'] = jobs['url'].map(normalize_url)
+    before = len(jobs)
+    jobs = jobs.drop_duplicates(subset=['url'], keep='first')
+    # Two keywords can still map to one output name; keep names unique per language
+    jobs = jobs.drop_duplicates(subset=['lang', 'title'], keep='first').reset_index(drop=True)
+    print(f"{before} links -> {len(jobs)} distinct articles")
+    return jobs
+
+
+def plan_jobs(master_path="master.csv", links_path="master_links.csv", use_api=False):
+    """
+    Builds the deduplicated job table. master.csv rows come first, so when the
+    same page is reached from both files it keeps its keyword and domain.
+
+    Returns:
+        pandas.DataFrame: One row per distinct article, columns PLAN_COLUMNS,
+        largest first.
+    """
+    parts = [melt_master(master_path)]
+    if links_path:
+        parts.append(melt_links(links_path))
+    plan = dedupe_jobs(pd.concat(parts, ignore_index=True))
+    plan['size'] = estimate_sizes(plan, use_api)
+    return plan.sort_values('size', ascending=False, na_position='last')[PLAN_COLUMNS]
+
+
+def write_plan(plan, path="jobs_plan.csv.gz"):
+    plan.to_csv(path, index=False, compression='gzip')
+    print(f"Wrote {len(plan)} jobs to {path}")
+
+
+def iter_plan(path="jobs_plan.csv.gz"):
+    """
+    Streams a job plan row by row without loading it whole.
+
+    Yields:
+        tuple: (lang, title, url, domain, size), as WorkQueue.enqueue_many takes them.
+    """
+    with gzip.open(path, 'rt', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            size = int(row['size']) if row['size'] else None
+            yield row['lang'], row['title'], row['url'], row['domain'] or None, size
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Turn master.csv and master_links.csv into one deduplicated job plan.")
+    parser.add_argument('--master', default="master.csv")
+    parser.add_argument('--links', default="master_links.csv", help="Extra (language, link) CSV; '' to skip.")
+    parser.add_argument('--out', default="jobs_plan.csv.gz")
+    parser.add_argument('--api-sizes', action='store_true',
+                        help="Look up page lengths from the wiki API instead of estimating them from stored HTML.")
+    args = parser.parse_args()
+    write_plan(plan_jobs(args.master, args.links, args.api_sizes), args.out)
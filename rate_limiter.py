@@ -0,0 +1,90 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from urllib.parse import urlparse
+from filelock import FileLock
+
+# The one place per-host rates are set. Every script draws from the same
+# bucket files, so they must all refill a host's bucket at the same rate.
+# Wikipedia asks bots to stay around one request per second per wiki.
+DEFAULT_RATE = 1.0
+# Overrides for particular hosts, e.g. {"gu.wikipedia.org": 2}
+HOST_RATES = {}
+DEFAULT_STATE_DIR = "rate_limits"
+
+
+def host_of(url_or_host):
+    return urlparse(url_or_host).netloc or url_or_host
+
+
+class RateLimiter:
+    """
+    Per-host token bucket shared by every script, task and process that uses
+    the same `state_dir`. Each host's bucket (tokens, last refill time) is
+    kept in a small JSON file guarded by a file lock, so workers in separate
+    processes draw from one budget.
+
+    A caller that finds the bucket empty reserves the next token and sleeps
+    exactly until it is due, so the request rate sits at the configured
+    ceiling instead of below it as with a fixed pause.
+
+    Rates are not per caller: every limiter uses HOST_RATES / DEFAULT_RATE,
+    so a host's ceiling is the same whichever script refills its bucket.
+    """
+
+    def __init__(self, burst=1, state_dir=DEFAULT_STATE_DIR):
+        """
+        Args:
+            burst (int): Tokens a bucket can hold, i.e. requests allowed back to back.
+            state_dir (str): Folder for the shared bucket files. None keeps the
+                buckets in this process only.
+        """
+        self.burst = burst
+        self.state_dir = state_dir
+        self._buckets = {}
+        self._lock = threading.Lock()
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+
+    def rate_for(self, host):
+        return HOST_RATES.get(host, DEFAULT_RATE)
+
+    def _load(self, path, now):
+        try:
+            with open(path, 'r') as f:
+                state = json.load(f)
+            return state['tokens'], state['time']
+        except (OSError, ValueError, KeyError):
+            return self.burst, now
+
+    def _reserve(self, host):
+        """Takes a token for `host` and returns how long to wait before using it."""
+        rate = self.rate_for(host)
+        with self._lock:
+            now = time.time()
+            if self.state_dir:
+                path = os.path.join(self.state_dir, f"{host}.bucket")
+                with FileLock(f"{path}.lock"):
+                    tokens, last = self._load(path, now)
+                    tokens = min(self.burst, tokens + (now - last) * rate) - 1
+                    with open(path, 'w') as f:
+                        json.dump({'tokens': tokens, 'time': now}, f)
+            else:
+                tokens, last = self._buckets.get(host, (self.burst, now))
+                tokens = min(self.burst, tokens + (now - last) * rate) - 1
+                self._buckets[host] = (tokens, now)
+        return max(0.0, -tokens / rate)
+
+    def acquire(self, url_or_host):
+        """Blocks until a request to the URL's host is allowed."""
+        wait = self._reserve(host_of(url_or_host))
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self, url_or_host):
+        """Waits, without blocking the event loop, until a request to the URL's host is allowed."""
+        wait = self._reserve(host_of(url_or_host))
+        if wait:
+            await asyncio.sleep(wait)
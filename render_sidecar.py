@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import fitz
+import pandas as pd
+from run_manifest import all_shard_paths, entry_time, file_sha256, shard_path
+
+
+def sidecar_path_for(pdf_path):
+    """`dumps_full/<code>/meta/<name>.json` for `dumps_full/<code>/pdf/<name>.pdf`."""
+    name = os.path.splitext(os.path.basename(pdf_path))[0]
+    return os.path.join(os.path.dirname(os.path.dirname(pdf_path)), "meta", f"{name}.json")
+
+
+def pdf_page_count(pdf):
+    """Page count of a PDF given as a path or as bytes."""
+    if isinstance(pdf, str):
+        with fitz.open(pdf) as doc:
+            return doc.page_count
+    with fitz.open(stream=pdf, filetype="pdf") as doc:
+        return doc.page_count
+
+
+def build_sidecar(lang, title, url, font_id, layout, pdf, html_content):
+    """
+    Describes one render: the sampled layout, the font, the PDF's page count,
+    and the byte sizes and SHA-256 hashes of the PDF and saved HTML.
+
+    Args:
+        lang (str): Language code.
+        title (str): Output name of the render (variant suffix included).
+        url (str): Article URL.
+        font_id (str): Font ID from FontRegistry.font_id().
+        layout (dict): Page width / height, columns and font size.
+        pdf (str | bytes): Path of the PDF, or its bytes.
+        html_content (str): The saved HTML.
+
+    Returns:
+        dict: The sidecar, ready to be dumped as JSON.
+    """
+    html_bytes = html_content.encode('utf-8')
+    if isinstance(pdf, str):
+        pdf_size, pdf_sha256 = os.path.getsize(pdf), file_sha256(pdf)
+    else:
+        pdf_size, pdf_sha256 = len(pdf), hashlib.sha256(pdf).hexdigest()
+    return {
+        'lang': lang,
+        'title': title,
+        'url': url,
+        'font': font_id,
+        'layout': layout,
+        'pages': pdf_page_count(pdf),
+        'pdf_bytes': pdf_size,
+        'pdf_sha256': pdf_sha256,
+        'html_bytes': len(html_bytes),
+        'html_sha256': hashlib.sha256(html_bytes).hexdigest(),
+        'time': entry_time(),
+    }
+
+
+def write_sidecar(path, sidecar):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(sidecar, f, ensure_ascii=False)
+
+
+def read_sidecar(pdf_path):
+    """The sidecar written next to a rendered PDF, or None if there is none."""
+    try:
+        with open(sidecar_path_for(pdf_path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+class RenderIndex:
+    """
+    Append-only JSONL index of every sidecar a run writes, one line per
+    render, so a whole run can be grouped or filtered by layout, font or page
+    count without opening any HTML or PDF. Workers append to their own shard
+    file; load_render_index() reads them all.
+    """
+
+    def __init__(self, path="dumps_full/render_index.jsonl", shard_index=0, num_shards=1):
+        path = shard_path(path, shard_index, num_shards)
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def record(self, sidecar):
+        self._file.write(json.dumps(sidecar, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def load_render_index(path="dumps_full/render_index.jsonl"):
+    """
+    Loads the render index of every shard into a DataFrame, with the layout
+    flattened into `layout.width`, `layout.columns`, ... columns. When a title
+    was rendered more than once, the entry with the latest `time` wins,
+    whichever shard file it is in.
+    """
+    entries = []
+    for existing in all_shard_paths(path):
+        with open(existing, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # Last line of a crashed run may be cut short
+                    continue
+    df = pd.json_normalize(entries)
+    if df.empty:
+        return df
+    # Shard files are read in name order, not time order
+    df = df.sort_values('time', kind='stable')
+    return df.drop_duplicates(subset=['lang', 'title'], keep='last').reset_index(drop=True)
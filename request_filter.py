@@ -0,0 +1,71 @@
+import re
+from collections import Counter
+
+# pyppeteer resource types: document, stylesheet, image, media, font, script,
+# texttrack, xhr, fetch, eventsource, websocket, manifest, other.
+#
+# Rules are checked in order and the first match wins. A rule matches when the
+# request's resource type is in `types` (if given) and its URL matches
+# `pattern` (if given).
+DEFAULT_RULES = [
+    {'name': 'document', 'action': 'allow', 'types': ['document']},
+    {'name': 'analytics', 'action': 'deny',
+     'pattern': r'intake-analytics\.wikimedia\.org|eventgate|/beacon/|EventLogging|Special:RecordImpression'},
+    {'name': 'banners', 'action': 'deny',
+     'pattern': r'CentralNotice|BannerLoader|CentralAutoLogin|/wiki/Special:BannerRandom'},
+    {'name': 'scripts', 'action': 'deny', 'types': ['script']},
+    {'name': 'background-traffic', 'action': 'deny',
+     'types': ['xhr', 'fetch', 'eventsource', 'websocket', 'manifest', 'texttrack', 'media', 'other']},
+    {'name': 'styles-images-fonts', 'action': 'allow', 'types': ['stylesheet', 'image', 'font']},
+]
+
+
+class RequestFilter:
+    """
+    Allow / deny policy for page requests, matched by resource type and URL
+    pattern. Denied requests are aborted so `networkidle0` does not wait on
+    traffic that has no effect on the printed article. Every rule counts its
+    hits.
+    """
+
+    def __init__(self, rules=None, default_action='allow'):
+        """
+        Args:
+            rules (list): Rule dicts with `name`, `action` ('allow' / 'deny'),
+                and optional `types` (list) and `pattern` (regex string).
+            default_action (str): Action for requests no rule matches.
+        """
+        self.rules = []
+        for rule in (DEFAULT_RULES if rules is None else rules):
+            if rule['action'] not in ('allow', 'deny'):
+                raise ValueError(f"Unknown action {rule['action']!r} in rule {rule['name']!r}")
+            self.rules.append({
+                'name': rule['name'],
+                'action': rule['action'],
+                'types': set(rule['types']) if rule.get('types') else None,
+                'pattern': re.compile(rule['pattern']) if rule.get('pattern') else None,
+            })
+        self.default_action = default_action
+        self.hits = Counter()
+
+    def decide(self, resource_type, url):
+        """Returns (rule name, action) for a request."""
+        for rule in self.rules:
+            if rule['types'] is not None and resource_type not in rule['types']:
+                continue
+            if rule['pattern'] is not None and not rule['pattern'].search(url):
+                continue
+            return rule['name'], rule['action']
+        return 'default', self.default_action
+
+    async def handle_request(self, request):
+        """Request handler for `install_request_handlers`: aborts denied requests."""
+        name, action = self.decide(request.resourceType, request.url)
+        self.hits[name] += 1
+        if action == 'deny':
+            await request.abort('blockedbyclient')
+            return True
+        return False
+
+    def stats(self):
+        return dict(self.hits)
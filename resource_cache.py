@@ -0,0 +1,234 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import weakref
+
+# Subresources that are shared between articles and worth keeping on disk
+CACHEABLE_TYPES = {'stylesheet', 'script', 'image', 'font'}
+
+# Response headers kept with a cached body and replayed on a hit
+KEPT_HEADERS = ('content-type', 'access-control-allow-origin')
+
+# Seconds between batched writes of hit times; eviction order only needs to be roughly right
+ACCESS_FLUSH_SECONDS = 60
+
+
+class ResourceCache:
+    """
+    On-disk, content-addressed cache for page subresources (skin CSS, JS,
+    logos, shared images). Bodies are stored once per SHA-256 under
+    `cache_dir/objects/`, and a small SQLite index maps URLs to bodies. The
+    least recently used entries are evicted once the stored bytes pass
+    `max_bytes`.
+    """
+
+    def __init__(self, cache_dir="resource_cache", max_bytes=2 * 1024 * 1024 * 1024):
+        """
+        Args:
+            cache_dir (str): Folder holding the index and the object files.
+            max_bytes (int): Total size of stored bodies before eviction starts.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._served = weakref.WeakSet()
+        # Hit times not written to the index yet, url -> time
+        self._pending_access = {}
+        self._last_flush = time.monotonic()
+        os.makedirs(os.path.join(cache_dir, "objects"), exist_ok=True)
+        # Several render processes may share one cache folder
+        self.db = sqlite3.connect(os.path.join(cache_dir, "index.sqlite"), timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                headers TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS entries_access ON entries (last_access)")
+        self.db.commit()
+        self._total = self.total_bytes()
+
+    def _object_path(self, digest):
+        return os.path.join(self.cache_dir, "objects", digest[:2], digest)
+
+    def total_bytes(self):
+        """Bytes held by distinct stored bodies."""
+        row = self.db.execute("SELECT SUM(size) FROM (SELECT DISTINCT digest, size FROM entries)").fetchone()
+        return row[0] or 0
+
+    def get(self, url):
+        """
+        Returns (headers, body) for a cached URL, or None on a miss. A body
+        whose object file has gone missing counts as a miss. The hit time is
+        buffered and written with others at most every ACCESS_FLUSH_SECONDS,
+        so hits do not contend for the index's write lock.
+        """
+        row = self.db.execute("SELECT digest, headers FROM entries WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        digest, headers = row
+        try:
+            with open(self._object_path(digest), 'rb') as f:
+                body = f.read()
+        except FileNotFoundError:
+            self.db.execute("DELETE FROM entries WHERE url = ?", (url,))
+            self.db.commit()
+            return None
+        self._pending_access[url] = time.time()
+        if time.monotonic() - self._last_flush >= ACCESS_FLUSH_SECONDS:
+            self.flush_access()
+        return json.loads(headers), body
+
+    def flush_access(self):
+        """Writes the buffered hit times to the index in one transaction."""
+        self._last_flush = time.monotonic()
+        if not self._pending_access:
+            return
+        pending = [(accessed, url) for url, accessed in self._pending_access.items()]
+        self._pending_access = {}
+        self.db.executemany("UPDATE entries SET last_access = ? WHERE url = ?", pending)
+        self.db.commit()
+
+    def put(self, url, headers, body):
+        """Stores `body` for `url`, writing the object file only if it is new."""
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+            self._total += len(body)
+        kept = {k: v for k, v in headers.items() if k.lower() in KEPT_HEADERS}
+        self.db.execute(
+            "INSERT OR REPLACE INTO entries (url, digest, headers, size, last_access) VALUES (?, ?, ?, ?, ?)",
+            (url, digest, json.dumps(kept), len(body), time.time())
+        )
+        self.db.commit()
+        if self._total > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Drops least recently used entries until the cache fits in `max_bytes`."""
+        self.flush_access()
+        total = self.total_bytes()
+        target = self.max_bytes * 0.9
+        for url, digest in self.db.execute("SELECT url, digest FROM entries ORDER BY last_access").fetchall():
+            if total <= target:
+                break
+            self.db.execute("DELETE FROM entries WHERE url = ?", (url,))
+            still_used = self.db.execute("SELECT size FROM entries WHERE digest = ? LIMIT 1", (digest,)).fetchone()
+            if still_used is None:
+                path = self._object_path(digest)
+                try:
+                    total -= os.path.getsize(path)
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        self.db.commit()
+        self._total = total
+
+    def close(self):
+        self.flush_access()
+        self.db.close()
+
+    def stats(self):
+        count = self.db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {'entries': count, 'bytes': self.total_bytes(), 'hits': self.hits, 'misses': self.misses}
+
+    async def handle_request(self, request):
+        """
+        Request handler for `install_request_handlers`: answers cacheable GET
+        requests from disk and lets everything else fall through.
+        """
+        if request.method != 'GET' or request.resourceType not in CACHEABLE_TYPES:
+            return False
+        cached = self.get(request.url)
+        if cached is None:
+            self.misses += 1
+            return False
+        self.hits += 1
+        headers, body = cached
+        self._served.add(request)
+        await request.respond({'status': 200, 'headers': headers, 'body': body})
+        return True
+
+    async def store_response(self, response):
+        """Saves a successful cacheable response that came from the network."""
+        request = response.request
+        if request in self._served or request.method != 'GET' or request.resourceType not in CACHEABLE_TYPES:
+            return
+        if response.status != 200:
+            return
+        try:
+            body = await response.buffer()
+        except Exception:
+            # Body is gone once the page navigates away
+            return
+        self.put(request.url, response.headers, body)
+
+    def attach(self, page):
+        """
+        Wires the cache into a tab: hits are served from disk and misses are
+        stored once their response arrives. Call this from a tab setup hook
+        before any navigation.
+        """
+        page.on('response', lambda response: asyncio.ensure_future(self.store_response(response)))
+        return self.handle_request
+
+
+if __name__ == "__main__":
+    # Offline check against a local HTTP stand-in: serve a page with one
+    # stylesheet and one image from a temp folder, load it twice, and make
+    # sure the second load is served from the cache.
+    import functools
+    import http.server
+    import sys
+    import tempfile
+    import threading
+    from pyppeteer import launch
+    from interception import install_request_handlers
+
+    chrome_path = sys.argv[1] if len(sys.argv) > 1 else "C:/Program Files/Google/Chrome/Application/chrome.exe"
+    site_dir = tempfile.mkdtemp()
+    with open(os.path.join(site_dir, "index.html"), 'w') as f:
+        f.write('<html><head><link rel="stylesheet" href="skin.css"></head>'
+                '<body><img src="logo.svg"><p>Hello</p></body></html>')
+    with open(os.path.join(site_dir, "skin.css"), 'w') as f:
+        f.write('p { color: red; }')
+    with open(os.path.join(site_dir, "logo.svg"), 'w') as f:
+        f.write('<svg xmlns="http://www.w3.org/2000/svg" width="10" height="10"></svg>')
+
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=site_dir)
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/index.html"
+
+    async def check():
+        cache = ResourceCache(tempfile.mkdtemp())
+        browser = await launch(headless=True, executablePath=chrome_path)
+        try:
+            for attempt in (1, 2):
+                page = await browser.newPage()
+                await install_request_handlers(page, [cache.attach(page)])
+                await page.goto(url, {'waitUntil': 'networkidle0'})
+                await asyncio.sleep(0.5)
+                print(f"Load {attempt}: {cache.stats()}")
+                await page.close()
+        finally:
+            await browser.close()
+            server.shutdown()
+        assert cache.hits == 2, "second load should serve both subresources from the cache"
+        print("Resource cache check passed")
+
+    asyncio.get_event_loop().run_until_complete(check())
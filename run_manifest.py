@@ -0,0 +1,205 @@
+import glob
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+
+def shard_path(path, shard_index, num_shards):
+    """
+    Per-worker file name for `path` when a run is split into shards, so
+    parallel workers never append to the same file.
+    """
+    if num_shards == 1:
+        return path
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.shard{shard_index}of{num_shards}{ext}"
+
+
+def all_shard_paths(path):
+    """`path` itself plus every per-shard file written next to it, whatever the shard count."""
+    stem, ext = os.path.splitext(path)
+    paths = sorted(glob.glob(f"{glob.escape(stem)}.shard*{ext}"))
+    if os.path.exists(path):
+        paths.insert(0, path)
+    return paths
+
+
+_last_entry_time = None
+
+
+def entry_time():
+    """
+    UTC timestamp for a ledger or manifest line, with microseconds and never
+    repeated within a process. The latest entry for a title is decided by
+    comparing these strings, not by which file was read last.
+    """
+    global _last_entry_time
+    now = datetime.now(timezone.utc)
+    if _last_entry_time is not None and now <= _last_entry_time:
+        now = _last_entry_time + timedelta(microseconds=1)
+    _last_entry_time = now
+    return now.isoformat(timespec='microseconds')
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def slice_sha256(path, offset, size, chunk_size=1024 * 1024):
+    """SHA-256 of `size` bytes at `offset` of a file, e.g. one member of a tar shard."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        while size > 0:
+            chunk = f.read(min(chunk_size, size))
+            if not chunk:
+                break
+            digest.update(chunk)
+            size -= len(chunk)
+    return digest.hexdigest()
+
+
+def pdf_is_complete(path, offset=None, size=None):
+    """
+    A PDF cut off mid-write has no %%EOF marker near its end. With `offset`
+    and `size`, checks a PDF stored at that position inside a larger file.
+    """
+    try:
+        with open(path, 'rb') as f:
+            if offset is None:
+                f.seek(0, os.SEEK_END)
+                end = f.tell()
+            else:
+                end = offset + size
+            start = max(offset or 0, end - 1024)
+            f.seek(start)
+            return b'%%EOF' in f.read(end - start)
+    except OSError:
+        return False
+
+
+class RunManifest:
+    """
+    Append-only JSONL record of finished (lang, title) jobs with their output
+    paths, sizes and SHA-256 checksums. Loaded into a dict at startup, so a
+    restarted run can skip finished work with one lookup per title. An output
+    only counts as finished if it is still on disk and matches what was
+    recorded; a file that merely exists is not trusted.
+    """
+
+    def __init__(self, path="dumps_full/manifest.jsonl", verify="size", shard_index=0, num_shards=1):
+        """
+        Args:
+            path (str): Manifest file, created if missing.
+            verify (str): "size" checks sizes and PDF end markers, "full" also
+                re-hashes every output, "none" trusts the manifest entry alone.
+            shard_index (int): This worker's shard; entries are appended to its own file.
+            num_shards (int): Total shards in the run. Entries of every shard file are loaded.
+        """
+        self.verify = verify
+        self.done = {}
+        for existing in all_shard_paths(path):
+            with open(existing, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Last line of a crashed run may be cut short
+                        continue
+                    key = (entry['lang'], entry['title'])
+                    # Shard files are read in name order, not time order; the latest entry wins
+                    if key not in self.done or entry.get('time', '') >= self.done[key].get('time', ''):
+                        self.done[key] = entry
+        path = shard_path(path, shard_index, num_shards)
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def __len__(self):
+        return len(self.done)
+
+    def _output_ok(self, output):
+        path = output['path']
+        offset = output.get('offset')
+        if offset is not None:
+            return self._packed_output_ok(output)
+        try:
+            if os.path.getsize(path) != output['size']:
+                return False
+        except OSError:
+            return False
+        if path.endswith('.pdf') and not pdf_is_complete(path):
+            return False
+        if self.verify == "full" and file_sha256(path) != output['sha256']:
+            return False
+        return True
+
+    def _packed_output_ok(self, output):
+        """Checks an output stored inside a shard (see shard_writer.py)."""
+        path, offset, size = output['path'], output['offset'], output['size']
+        try:
+            if os.path.getsize(path) < offset + size:
+                return False
+        except OSError:
+            return False
+        if output.get('kind') == 'pdf' and not pdf_is_complete(path, offset, size):
+            return False
+        if self.verify == "full" and slice_sha256(path, offset, size) != output['sha256']:
+            return False
+        return True
+
+    def is_done(self, lang, title):
+        """True if the job was recorded and all of its outputs check out."""
+        entry = self.done.get((lang, title))
+        if entry is None or entry.get('invalidated'):
+            return False
+        if self.verify == "none":
+            return True
+        return all(self._output_ok(output) for output in entry['outputs'])
+
+    def record(self, lang, title, paths):
+        """
+        Records a finished job and the files it produced.
+
+        Args:
+            paths (list): Output file paths, which are hashed here. Outputs
+                already hashed (a render's sidecar has the PDF and HTML hashes)
+                or packed into shards (the entries ShardWriter.add() returned)
+                are passed as dicts with `path`, `size` and `sha256` instead.
+        """
+        outputs = [
+            p if isinstance(p, dict) else {'path': p, 'size': os.path.getsize(p), 'sha256': file_sha256(p)}
+            for p in paths
+        ]
+        entry = {
+            'lang': lang,
+            'title': title,
+            'outputs': outputs,
+            'time': entry_time(),
+        }
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self.done[(lang, title)] = entry
+
+    def invalidate(self, lang, title):
+        """Marks a job as needing a new render (e.g. its article was edited), whatever is on disk."""
+        entry = {
+            'lang': lang,
+            'title': title,
+            'outputs': [],
+            'invalidated': True,
+            'time': entry_time(),
+        }
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self.done[(lang, title)] = entry
+
+    def close(self):
+        self._file.close()
@@ -1,11 +1,15 @@
 import pandas as pd
 import wikipedia
-import time
+from rate_limiter import RateLimiter
 
 # Define the input and output file names
 input_file = 'original_csvs/india_tourism.csv'
 output_file = 'domain-csvs/tourism.csv'
 
+# The wikipedia package talks to en.wikipedia.org; lookups share its rate budget
+WIKI_HOST = 'en.wikipedia.org'
+rate_limiter = RateLimiter()
+
 # Read the keywords from the CSV file
 try:
     df = pd.read_csv(input_file)
@@ -26,6 +30,7 @@ third_links = []
 
 for index, row in df.iterrows():
     search_term = str(row['Keyword'])
+    rate_limiter.acquire(WIKI_HOST)
     try:
         # Search Wikipedia for the keyword and get the first result's page object
         page = wikipedia.page(search_term, auto_suggest=False, redirect=True)
@@ -61,10 +66,10 @@ for index, row in df.iterrows():
             first_links.append(link)
             if len(e.options) > 2:
                 try:
-                    time.sleep(0.5)
+                    rate_limiter.acquire(WIKI_HOST)
                     second_option = e.options[1]
                     page1 = wikipedia.page(second_option, auto_suggest=False, redirect=True)
-                    time.sleep(0.5)
+                    rate_limiter.acquire(WIKI_HOST)
                     third_option = e.options[2]
                     page2 = wikipedia.page(third_option, auto_suggest=False, redirect=True)
 
@@ -80,7 +85,7 @@ for index, row in df.iterrows():
                     
             else:
                 try:
-                    time.sleep(0.5)
+                    rate_limiter.acquire(WIKI_HOST)
                     second_option = e.options[1]
                     page = wikipedia.page(second_option, auto_suggest=False, redirect=True)
                     second_links.append(page.url)
@@ -110,7 +115,6 @@ for index, row in df.iterrows():
         third_links.append("")
         print(f"An unexpected error occurred for '{search_term}': {e}")
 
-    time.sleep(0.5)
 
 print(len(first_links), len(second_links), len(third_links))
 
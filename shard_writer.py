@@ -0,0 +1,168 @@
+import glob
+import hashlib
+import io
+import os
+import sqlite3
+import tarfile
+import time
+
+# A shard is closed and a new one started once it grows past this many bytes
+MAX_SHARD_BYTES = 1024 * 1024 * 1024
+INDEX_NAME = "index.sqlite"
+
+
+def open_index(output_dir):
+    db = sqlite3.connect(os.path.join(output_dir, INDEX_NAME), timeout=60)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS samples (
+            lang TEXT NOT NULL,
+            title TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            shard TEXT NOT NULL,
+            offset INTEGER NOT NULL,
+            length INTEGER NOT NULL,
+            PRIMARY KEY (lang, title, kind)
+        )
+    """)
+    return db
+
+
+class ShardWriter:
+    """
+    Packs rendered samples into size-capped, uncompressed tar shards instead
+    of millions of loose files. Every sample's files (PDF, HTML, sidecars)
+    are written next to each other as `<lang>/<title>.<kind>` members, and a
+    SQLite index maps (lang, title, kind) to (shard, offset, length) so a
+    reader fetches any one file with a single seek. Shards are plain tars, so
+    training jobs can also stream them front to back.
+
+    Each writer only ever appends to shards it created itself (named after
+    `worker_tag`); a restarted worker starts a fresh shard rather than
+    appending to one that may have been cut off mid-member.
+    """
+
+    def __init__(self, output_dir="dumps_full/shards", worker_tag="w0", max_shard_bytes=MAX_SHARD_BYTES):
+        """
+        Args:
+            output_dir (str): Folder for the shards and the index.
+            worker_tag (str): Distinguishes the shards of parallel workers.
+            max_shard_bytes (int): Size after which a shard is closed.
+        """
+        self.output_dir = output_dir
+        self.worker_tag = worker_tag
+        self.max_shard_bytes = max_shard_bytes
+        os.makedirs(output_dir, exist_ok=True)
+        self.db = open_index(output_dir)
+        self._tar = None
+        self.shard_name = None
+        existing = glob.glob(os.path.join(glob.escape(output_dir), f"shard-{worker_tag}-*.tar"))
+        self._next_number = len(existing)
+
+    def _open_shard(self):
+        while True:
+            self.shard_name = f"shard-{self.worker_tag}-{self._next_number:05d}.tar"
+            self._next_number += 1
+            path = os.path.join(self.output_dir, self.shard_name)
+            if not os.path.exists(path):
+                break
+        self._tar = tarfile.open(path, mode='w', format=tarfile.PAX_FORMAT)
+        print(f"Writing shard {path}")
+
+    def _close_shard(self):
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
+
+    def add(self, lang, title, files):
+        """
+        Appends one sample's files to the current shard and indexes them.
+
+        Args:
+            lang (str): Language code.
+            title (str): Sample name (the output filename without extension).
+            files (dict): kind (e.g. 'pdf', 'html', 'json') -> bytes.
+
+        Returns:
+            list: One output entry per file (path, kind, offset, size, sha256), as
+            RunManifest.record() accepts them.
+        """
+        if self._tar is None or self._tar.fileobj.tell() >= self.max_shard_bytes:
+            self._close_shard()
+            self._open_shard()
+        path = os.path.join(self.output_dir, self.shard_name)
+        now = time.time()
+        outputs = []
+        rows = []
+        for kind, data in files.items():
+            info = tarfile.TarInfo(f"{lang}/{title}.{kind}")
+            info.size = len(data)
+            info.mtime = now
+            # Data starts right after the member's header (PAX headers vary in length)
+            offset = self._tar.offset + len(info.tobuf(self._tar.format, self._tar.encoding, self._tar.errors))
+            self._tar.addfile(info, io.BytesIO(data))
+            rows.append((lang, title, kind, self.shard_name, offset, len(data)))
+            outputs.append({
+                'path': path,
+                'kind': kind,
+                'offset': offset,
+                'size': len(data),
+                'sha256': hashlib.sha256(data).hexdigest(),
+            })
+        # The data is on disk before the index points at it
+        self._tar.fileobj.flush()
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO samples VALUES (?, ?, ?, ?, ?, ?)", rows)
+        return outputs
+
+    def add_alias(self, lang, title, source_lang, source_title):
+        """Indexes `title` as another name for the files already stored for `source_title`."""
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO samples SELECT ?, ?, kind, shard, offset, length FROM samples "
+                "WHERE lang = ? AND title = ?",
+                (lang, title, source_lang, source_title)
+            )
+
+    def close(self):
+        self._close_shard()
+        self.db.close()
+
+
+class ShardReader:
+    """Random access to the samples of a shard folder through its index."""
+
+    def __init__(self, output_dir="dumps_full/shards"):
+        self.output_dir = output_dir
+        self.db = open_index(output_dir)
+
+    def locate(self, lang, title, kind='pdf'):
+        """(shard path, offset, length) of one file, or None."""
+        row = self.db.execute(
+            "SELECT shard, offset, length FROM samples WHERE lang = ? AND title = ? AND kind = ?",
+            (lang, title, kind)
+        ).fetchone()
+        if row is None:
+            return None
+        return os.path.join(self.output_dir, row[0]), row[1], row[2]
+
+    def read(self, lang, title, kind='pdf'):
+        """Bytes of one file of a sample, or None if it is not in the index."""
+        location = self.locate(lang, title, kind)
+        if location is None:
+            return None
+        path, offset, length = location
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def close(self):
+        self.db.close()
+
+
+def iter_shard_members(shard_path):
+    """Streams (member name, bytes) from one shard front to back, e.g. for training."""
+    with tarfile.open(shard_path, mode='r|') as tar:
+        for member in tar:
+            if member.isfile():
+                yield member.name, tar.extractfile(member).read()
@@ -0,0 +1,81 @@
+import json
+import os
+import random
+from run_manifest import all_shard_paths, entry_time, shard_path
+
+
+class SkipArticle(Exception):
+    """Raised for failures that retrying will not fix (bad URL, no stored HTML)."""
+
+
+def backoff_delay(attempt, base_delay=2, max_delay=60):
+    """
+    Exponential backoff with full jitter: a random delay between 0 and
+    `base_delay * 2 ** (attempt - 1)` seconds, capped at `max_delay`.
+    """
+    return random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+
+
+class SkipLedger:
+    """
+    Append-only JSONL record of articles that could not be rendered, with the
+    error class, message, attempts and time spent. It survives crashes (each
+    line is flushed as it is written) and can be read back to retry only the
+    failed set.
+    """
+
+    def __init__(self, path="skipped_pages.jsonl", shard_index=0, num_shards=1):
+        path = shard_path(path, shard_index, num_shards)
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def _append(self, entry):
+        entry['time'] = entry_time()
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def record_failure(self, lang, title, url, error, attempts, elapsed):
+        self._append({
+            'status': 'failed',
+            'lang': lang,
+            'title': title,
+            'url': url,
+            'error': type(error).__name__,
+            'message': str(error)[:500],
+            'attempts': attempts,
+            'elapsed': round(elapsed, 2),
+        })
+
+    def record_resolved(self, lang, title, url):
+        """Marks a previously failed article as rendered, so it leaves the failed set."""
+        self._append({'status': 'resolved', 'lang': lang, 'title': title, 'url': url})
+
+    def close(self):
+        self._file.close()
+
+
+def load_failed(path="skipped_pages.jsonl"):
+    """
+    Returns the latest failure entry of every (lang, title) whose most recent
+    ledger line is still a failure. Per-shard ledgers next to `path` are read
+    too; entries are ordered by their `time`, whichever file they are in.
+    """
+    latest = {}
+    for existing in all_shard_paths(path):
+        with open(existing, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Last line of a crashed run may be cut short
+                    continue
+                key = (entry['lang'], entry['title'])
+                if key not in latest or entry.get('time', '') >= latest[key].get('time', ''):
+                    latest[key] = entry
+    return [entry for entry in latest.values() if entry['status'] == 'failed']
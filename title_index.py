@@ -0,0 +1,111 @@
+import mmap
+import os
+import struct
+from array import array
+from urllib.parse import quote
+
+# Index file layout: magic, dump size, dump mtime (ns), line count, then one
+# unsigned 64-bit start offset per title line.
+INDEX_MAGIC = b'WTIDX001'
+HEADER = struct.Struct('<8sQQQ')
+
+
+def index_path_for(dump_path):
+    return f"{dump_path}.idx"
+
+
+def build_index(dump_path, skip_header=True):
+    """
+    Scans a title dump once and writes the byte offset of every title line to
+    `<dump>.idx`. The first line of a `*-all-titles-in-ns0.txt` dump is the
+    "page_title" header and is left out.
+
+    Returns:
+        array: Start offsets of the title lines.
+    """
+    offsets = array('Q')
+    stat = os.stat(dump_path)
+    if stat.st_size:
+        with open(dump_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = 0
+            if skip_header:
+                pos = mm.find(b'\n') + 1 or stat.st_size
+            while pos < stat.st_size:
+                offsets.append(pos)
+                end = mm.find(b'\n', pos)
+                if end == -1:
+                    break
+                pos = end + 1
+
+    tmp_path = index_path_for(dump_path) + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(INDEX_MAGIC, stat.st_size, stat.st_mtime_ns, len(offsets)))
+        offsets.tofile(f)
+    os.replace(tmp_path, index_path_for(dump_path))
+    print(f"Indexed {len(offsets)} titles in {dump_path}")
+    return offsets
+
+
+def load_index(dump_path):
+    """
+    Returns the line offsets for `dump_path`, building the index first if it
+    is missing or the dump has changed since it was built.
+    """
+    path = index_path_for(dump_path)
+    stat = os.stat(dump_path)
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            magic, size, mtime_ns, count = HEADER.unpack(f.read(HEADER.size))
+            if magic == INDEX_MAGIC and size == stat.st_size and mtime_ns == stat.st_mtime_ns:
+                offsets = array('Q')
+                offsets.fromfile(f, count)
+                return offsets
+    return build_index(dump_path)
+
+
+def shard_range(total, shard_index, num_shards):
+    """Contiguous [start, stop) line range of one shard."""
+    per_shard, extra = divmod(total, num_shards)
+    start = shard_index * per_shard + min(shard_index, extra)
+    stop = start + per_shard + (1 if shard_index < extra else 0)
+    return start, stop
+
+
+def iter_shard(dump_path, shard_index=0, num_shards=1, strided=False):
+    """
+    Yields (line_number, line) for one shard of a title dump, seeking straight
+    to the shard's lines through the offset index.
+
+    Args:
+        dump_path (str): The `*-all-titles-in-ns0.txt` dump.
+        shard_index (int): Which shard to read, from 0 to num_shards - 1.
+        num_shards (int): Total number of shards.
+        strided (bool): Take every num_shards-th line instead of a contiguous block.
+    """
+    offsets = load_index(dump_path)
+    if strided:
+        line_numbers = range(shard_index, len(offsets), num_shards)
+    else:
+        line_numbers = range(*shard_range(len(offsets), shard_index, num_shards))
+    if not line_numbers:
+        return
+
+    with open(dump_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for n in line_numbers:
+            start = offsets[n]
+            end = offsets[n + 1] if n + 1 < len(offsets) else len(mm)
+            yield n, mm[start:end].decode('utf-8').rstrip('\r\n')
+
+
+def parse_dump_line(line, lang):
+    """
+    Returns (url, output_filename) for a dump line. Lines may be bare titles
+    (as downloaded) or full article URLs.
+    """
+    if line.startswith('http'):
+        url = line
+        title = line.split('/wiki/', 1)[-1]
+    else:
+        title = line
+        url = f"https://{lang}.wikipedia.org/wiki/{quote(title)}"
+    return url, title.replace('/', '_')
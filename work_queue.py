@@ -0,0 +1,259 @@
+import os
+import socket
+import sqlite3
+import time
+from job_sizes import UNKNOWN_SIZE, load_sizes
+from plan_jobs import dedupe_jobs, iter_plan, melt_master
+from title_index import iter_shard, parse_dump_line
+
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class WorkQueue:
+    """
+    Render job queue stored in a SQLite file. Jobs move through
+    pending -> leased -> done / failed. A lease carries an expiry that the
+    worker extends with heartbeats; leases that expire (a worker died or lost
+    its host) go back to pending and are picked up by someone else.
+
+    Every worker on every host opens the same file, so for several machines it
+    must live on a filesystem with working locks.
+    """
+
+    def __init__(self, path="render_queue.sqlite", lease_seconds=300, max_attempts=3):
+        """
+        Args:
+            path (str): SQLite file, created if missing.
+            lease_seconds (float): How long a lease lasts without a heartbeat.
+            max_attempts (int): Leases after which a job that keeps failing stays failed.
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                lang TEXT NOT NULL,
+                title TEXT NOT NULL,
+                url TEXT NOT NULL,
+                domain TEXT,
+                size INTEGER,
+                state TEXT NOT NULL DEFAULT 'pending',
+                worker TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated REAL,
+                UNIQUE (lang, title)
+            )
+        """)
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(jobs)")]
+        if 'size' not in columns:
+            # Queues created before jobs carried a size estimate
+            self.db.execute("ALTER TABLE jobs ADD COLUMN size INTEGER")
+        self.db.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, id)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS jobs_size ON jobs (state, size DESC, id)")
+
+    def enqueue_many(self, jobs, batch_size=10000):
+        """
+        Bulk-inserts jobs, ignoring any (lang, title) already queued.
+
+        Args:
+            jobs (iterable): (lang, title, url, domain) or (lang, title, url, domain, size)
+                tuples. Consumed in batches.
+
+        Returns:
+            int: Number of jobs that were new.
+        """
+        added = 0
+        batch = []
+        for job in jobs:
+            batch.append(job)
+            if len(batch) >= batch_size:
+                added += self._insert(batch)
+                batch = []
+        if batch:
+            added += self._insert(batch)
+        return added
+
+    def _insert(self, batch):
+        now = time.time()
+        with self._transaction():
+            before = self.db.total_changes
+            self.db.executemany(
+                "INSERT OR IGNORE INTO jobs (lang, title, url, domain, size, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                [(*job[:4], job[4] if len(job) > 4 else None, now) for job in batch]
+            )
+            return self.db.total_changes - before
+
+    def _transaction(self):
+        return _ImmediateTransaction(self.db)
+
+    def reclaim_expired(self):
+        """Returns jobs whose lease ran out to pending. Returns how many were reclaimed."""
+        with self._transaction():
+            cursor = self.db.execute(
+                "UPDATE jobs SET state = ?, worker = NULL, lease_expires = NULL, updated = ? "
+                "WHERE state = ? AND lease_expires < ?",
+                (PENDING, time.time(), LEASED, time.time())
+            )
+            return cursor.rowcount
+
+    def lease(self, worker_id, count=1):
+        """
+        Leases up to `count` pending jobs to `worker_id`, reclaiming expired
+        leases first. The largest jobs are handed out first, so giant articles
+        do not end up as the last stragglers of a run; jobs without a size come last.
+
+        Returns:
+            list: (id, lang, title, url, domain) tuples.
+        """
+        self.reclaim_expired()
+        now = time.time()
+        with self._transaction():
+            rows = self.db.execute(
+                "SELECT id, lang, title, url, domain FROM jobs WHERE state = ? ORDER BY size DESC, id LIMIT ?",
+                (PENDING, count)
+            ).fetchall()
+            self.db.executemany(
+                "UPDATE jobs SET state = ?, worker = ?, lease_expires = ?, attempts = attempts + 1, updated = ? "
+                "WHERE id = ?",
+                [(LEASED, worker_id, now + self.lease_seconds, now, row[0]) for row in rows]
+            )
+        return rows
+
+    def heartbeat(self, worker_id, job_ids):
+        """Extends the leases `worker_id` holds on `job_ids`."""
+        now = time.time()
+        with self._transaction():
+            self.db.executemany(
+                "UPDATE jobs SET lease_expires = ?, updated = ? WHERE id = ? AND worker = ? AND state = ?",
+                [(now + self.lease_seconds, now, job_id, worker_id, LEASED) for job_id in job_ids]
+            )
+
+    def complete(self, job_id, worker_id):
+        with self._transaction():
+            self.db.execute(
+                "UPDATE jobs SET state = ?, lease_expires = NULL, updated = ? WHERE id = ? AND worker = ?",
+                (DONE, time.time(), job_id, worker_id)
+            )
+
+    def fail(self, job_id, worker_id, error):
+        """
+        Records a failed attempt. The job goes back to pending until it has
+        used up `max_attempts` leases, then stays failed.
+        """
+        with self._transaction():
+            self.db.execute(
+                "UPDATE jobs SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+                "worker = NULL, lease_expires = NULL, last_error = ?, updated = ? WHERE id = ? AND worker = ?",
+                (self.max_attempts, FAILED, PENDING, str(error)[:500], time.time(), job_id, worker_id)
+            )
+
+    def requeue_failed(self):
+        """Puts every failed job back to pending with a fresh attempt count."""
+        with self._transaction():
+            return self.db.execute(
+                "UPDATE jobs SET state = ?, attempts = 0, updated = ? WHERE state = ?",
+                (PENDING, time.time(), FAILED)
+            ).rowcount
+
+    def requeue(self, jobs):
+        """
+        Queues jobs again even if they were done or failed before (e.g. their
+        article changed). Jobs not in the queue yet are added.
+
+        Args:
+            jobs (iterable): (lang, title, url, domain[, size]) tuples, as enqueue_many() takes them.
+
+        Returns:
+            int: Number of jobs put back to pending.
+        """
+        jobs = list(jobs)
+        self.enqueue_many(jobs)
+        with self._transaction():
+            before = self.db.total_changes
+            self.db.executemany(
+                "UPDATE jobs SET state = ?, attempts = 0, worker = NULL, lease_expires = NULL, updated = ? "
+                "WHERE lang = ? AND title = ? AND state != ?",
+                [(PENDING, time.time(), job[0], job[1], LEASED) for job in jobs]
+            )
+            return self.db.total_changes - before
+
+    def counts(self):
+        return dict(self.db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+
+    def close(self):
+        self.db.close()
+
+
+class _ImmediateTransaction:
+    """BEGIN IMMEDIATE ... COMMIT, so concurrent workers never lease the same job."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute("COMMIT" if exc_type is None else "ROLLBACK")
+
+
+def jobs_from_dump(dump_path, lang):
+    """
+    (lang, title, url, domain, size) for every title in a `*-all-titles-in-ns0.txt`
+    dump, with sizes from `<dump>.sizes` when job_sizes.py has built it.
+    """
+    sizes = load_sizes(dump_path)
+    for n, line in iter_shard(dump_path):
+        if line:
+            url, title = parse_dump_line(line, lang)
+            size = sizes[n] if sizes is not None and sizes[n] != UNKNOWN_SIZE else None
+            yield lang, title, url, None, size
+
+
+def jobs_from_master(csv_path="master.csv"):
+    """
+    (lang, title, url, domain) for every distinct article master.csv links to,
+    melted and deduplicated on normalised URL as plan_jobs.py does it.
+    """
+    jobs = dedupe_jobs(melt_master(csv_path))
+    domains = jobs['domain'].astype(object).where(jobs['domain'].notna(), None)
+    yield from zip(jobs['lang'], jobs['title'], jobs['url'], domains)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fill or inspect the render work queue.")
+    parser.add_argument('--queue', default="render_queue.sqlite")
+    parser.add_argument('--dump', help="Enqueue every title of this dump file.")
+    parser.add_argument('--lang', help="Language code of --dump.")
+    parser.add_argument('--master', help="Enqueue every language link of this master.csv.")
+    parser.add_argument('--plan', help="Enqueue the jobs of a plan written by plan_jobs.py.")
+    parser.add_argument('--requeue-failed', action='store_true')
+    args = parser.parse_args()
+
+    queue = WorkQueue(args.queue)
+    if args.dump:
+        print(f"Enqueued {queue.enqueue_many(jobs_from_dump(args.dump, args.lang))} jobs from {args.dump}")
+    if args.master:
+        print(f"Enqueued {queue.enqueue_many(jobs_from_master(args.master))} jobs from {args.master}")
+    if args.plan:
+        print(f"Enqueued {queue.enqueue_many(iter_plan(args.plan))} jobs from {args.plan}")
+    if args.requeue_failed:
+        print(f"Requeued {queue.requeue_failed()} failed jobs")
+    print(queue.counts())
+    queue.close()